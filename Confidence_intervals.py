@@ -1,10 +1,11 @@
 """
 Date: 11.02.2025
 Description: This module contains functions for calculating confidence intervals.
+             The delta method functions propagate the full covariance through the model Jacobian.
 Author: Kaiyu Qian
 """
 import numpy as np
-from scipy import stats, optimize
+from scipy import stats
 
 def covariance_params(covariance_level, years, model_params, covariance, z_t):
     """
@@ -34,23 +35,120 @@ def covariance_params(covariance_level, years, model_params, covariance, z_t):
     else:
         return None, None
 
-def covariance_matrix(model, x, y, params, eps=1e-9):
+def critical_value(covariance_level, dof, z_t):
+    """
+    Two sided critical value, the band covers covariance_level percent
+    (covariance_params above uses the quantile 0.5 + alpha / 2 instead)
+    Parameters:
+        covariance_level: int, in precentage[0, 100]
+        dof: int or array_like, degrees of freedom of the t distribution
+        z_t: str, "z" or "t"
+    Return:
+        float or array_like
+    """
+    alpha = 1 - covariance_level / 100
+    if z_t == "z":
+        return stats.norm.ppf(1 - alpha / 2) * np.ones_like(dof, dtype=float)
+    elif z_t == "t":
+        return stats.t.ppf(1 - alpha / 2, np.maximum(dof, 1))
+    raise ValueError(f"Unknown confidence mode: {z_t}")
+
+def model_jacobian(model, x, params, eps=None):
+    """
+    Derivative of the model with respect to the parameters at every x (central differences,
+    one model evaluation over the whole x per parameter and side)
+    Parameters:
+        model: model function
+        x: array_like
+        params: list or array_like
+        eps: float, relative step, None uses the cube root of the machine precision
+    Return:
+        J: 2-D array (len(x), len(params))
+    """
+    x = np.asarray(x, dtype=float)
+    params = np.asarray(params, dtype=float)
+    if eps is None:
+        eps = np.finfo(float).eps ** (1 / 3)
+    J = np.empty((x.size, params.size))
+    for j in range(params.size):
+        h = eps * max(abs(params[j]), 1.0)
+        p_plus, p_minus = params.copy(), params.copy()
+        p_plus[j] += h
+        p_minus[j] -= h
+        J[:, j] = (model(x, *p_plus) - model(x, *p_minus)) / (2 * h)
+    return J
+
+def residual_variance(model, x, y, params):
+    """
+    Parameters:
+        model: model function
+        x: array_like
+        y: array_like
+        params: list or array_like
+    Return:
+        float, sum of squared residuals / (N - M)
+    """
+    residuals = np.asarray(y, dtype=float) - model(np.asarray(x, dtype=float), *params)
+    return np.sum(residuals**2) / max(len(residuals) - len(params), 1)
+
+def delta_method_bands(predictions, jacobians, covariances, critical_values, residual_variances=None):
+    """
+    Confidence (or prediction) bands of many series at once by propagating the parameter
+    covariance through the model Jacobian: var = J C J^T (+ residual variance)
+    Parameters:
+        predictions: 2-D array (S, N), the model at the N forecast years of S series
+        jacobians: 3-D array (S, N, M)
+        covariances: 3-D array (S, M, M)
+        critical_values: 1-D array (S,), see critical_value
+        residual_variances: 1-D array (S,), optional, gives prediction intervals
+    Return:
+        lower: 2-D array (S, N), upper: 2-D array (S, N)
+    """
+    variance = np.einsum("snm,smk,snk->sn", jacobians, covariances, jacobians)
+    if residual_variances is not None:
+        variance = variance + np.asarray(residual_variances, dtype=float)[:, None]
+    half_width = np.asarray(critical_values, dtype=float)[:, None] * np.sqrt(np.maximum(variance, 0))
+    return predictions - half_width, predictions + half_width
+
+def delta_method_band(model, x, params, covariance, covariance_level, n_obs, z_t="t",
+                      residual_var=None):
+    """
+    Delta method band of one series
+    Parameters:
+        model: model function
+        x: array_like, forecast points
+        params: array_like
+        covariance: 2-D array
+        covariance_level: int, in precentage[0, 100]
+        n_obs: int, number of data points of the fit (t has n_obs - M degrees of freedom)
+        z_t: str, "z" or "t"
+        residual_var: float, optional, gives a prediction interval instead of a confidence band
+    Return:
+        array_like, array_like
+    """
+    params = np.asarray(params, dtype=float)
+    prediction = model(np.asarray(x, dtype=float), *params)
+    crit = critical_value(covariance_level, n_obs - params.size, z_t)
+    lower, upper = delta_method_bands(
+        prediction[None, :], model_jacobian(model, x, params)[None], np.asarray(covariance)[None],
+        np.atleast_1d(crit), None if residual_var is None else np.atleast_1d(residual_var))
+    return lower[0], upper[0]
+
+def covariance_matrix(model, x, y, params, eps=None):
     """
     Parameters:
         model: model function
         x: array_like
         y: array_like
         params: list or array_like
-        eps: float
+        eps: float, relative step of the Jacobian, see model_jacobian
     Return:
         pcov: 2-D array
     """
     N = len(x)
     M = len(params)
-    J = np.zeros((N, M))
-    for i in range(N):
-        J[i,:] = optimize.approx_fprime(params, lambda p: model(x[i], *p), eps)
-        
+    J = model_jacobian(model, x, params, eps)
+
     residuals = y - model(x, *params)
     MSE = np.sum(residuals**2) / (N - M)
     try:
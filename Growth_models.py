@@ -0,0 +1,458 @@
+"""
+Date: 19.10.2026
+Description: This module contains the growth model functions and the helpers to load a series
+and fit the models to it. The fit scales the years and values internally and returns the
+parameters in years and value units, so callers need no per-model preprocessing. It only
+imports numpy at module level, scipy and pandas are loaded when a fit or a load is requested,
+so the scripts and the command line tool start quickly.
+Author: Kaiyu Qian
+"""
+import numpy as np
+
+MODEL_NAMES = ["logistic", "gompertz", "gaussian", "exponential", "power_law"]
+MODEL_LABELS = {
+    "logistic": "Logistic",
+    "gompertz": "Gompertz",
+    "gaussian": "Gaussian",
+    "exponential": "Exponential",
+    "power_law": "Power Law",
+}
+MODEL_PARAMS = {
+    "logistic": ["K", "b", "x0"],
+    "gompertz": ["K", "b", "x0"],
+    "gaussian": ["A", "c1", "c2", "u"],
+    "exponential": ["c", "l", "a"],
+    "power_law": ["a", "b"],
+}
+
+# ------------------------------------------------------------
+# The growth models
+def logistic_growth(x, K, b, x0):
+    """return : array_like"""
+    return K / (1 + np.exp(-b * (x - x0)))
+
+def gompertz_growth(x, K, b, x0):
+    """return : array_like"""
+    return K * np.exp(-np.exp(-b * (x - x0)))
+
+def gaussian_growth(x, A, c1, c2, u):
+    """return : array_like, width c1 before and c2 after the peak u"""
+    z = np.asarray(x, dtype=float) - u
+    # Only the exponential of the matching side is evaluated for every point
+    width = np.where(z < 0, c1, c2)
+    return A * np.exp(-0.5 * (z / width)**2)
+
+def exponential_growth(x, c, l, a):
+    """return : array_like"""
+    return c * (1 - np.exp(-((x/l)**a)))
+
+def power_law(x, a, b):
+    """return : array_like"""
+    return a * (x**b)
+
+MODEL_FUNCTIONS = {
+    "logistic": logistic_growth,
+    "gompertz": gompertz_growth,
+    "gaussian": gaussian_growth,
+    "exponential": exponential_growth,
+    "power_law": power_law,
+}
+
+# ------------------------------------------------------------
+# Helpers
+def r2_score(y_true, y_pred):
+    """
+    Coefficient of determination, same result as sklearn.metrics.r2_score
+    Parameters:
+        y_true: array_like
+        y_pred: array_like
+    Return:
+        float
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    ss_res = np.sum((y_true - y_pred)**2)
+    ss_tot = np.sum((y_true - np.mean(y_true))**2)
+    if ss_tot == 0:
+        return 1.0 if ss_res == 0 else 0.0
+    return 1 - ss_res / ss_tot
+
+def column_index(letter):
+    """
+    Position of an Excel column letter
+    Parameters:
+        letter: str, e.g. "A" or "AB"
+    Return:
+        int, "A" -> 0, "AB" -> 27
+    """
+    index = 0
+    for char in letter.strip().upper():
+        index = index * 26 + ord(char) - ord("A") + 1
+    return index - 1
+
+def load_series(file_path, data_cols, sheet=0):
+    """
+    Read the years and values from an Excel file
+    Parameters:
+        file_path: str
+        data_cols: str, the columns of years and values, e.g. "A, E"
+        sheet: str or int
+    Return:
+        array_like, array_like, str (name of the value column)
+    """
+    from Series_panel import SeriesPanel
+    year_col, value_col = data_cols.split(",")
+    panel = SeriesPanel.from_excel(file_path, year_col, [value_col], sheet)
+    years, values = panel.row(0)
+    return years, values, panel.names[0]
+
+# ------------------------------------------------------------
+# Scaling of the models
+# The solver works on scaled years x' = (x - x_offset) / x_scale and values y' = y / y_scale,
+# so that all parameters are of order one. The parameters are transformed back with
+# p = p_scale * p' + p_offset and the covariance with diag(p_scale). Callers always pass and
+# receive the parameters in years and value units.
+def _model_origin(name, years):
+    """return : float, the year where x = 0 for the models that are not shift invariant"""
+    return float(np.min(years)) if name in ("exponential", "power_law") else 0.0
+
+def _solver_scaling(name, years, values):
+    """return : x_offset, x_scale, y_scale of the solver"""
+    years = np.asarray(years, dtype=float)
+    y_scale = float(np.max(np.abs(values))) or 1.0
+    if name in ("logistic", "gompertz", "gaussian"):
+        return float(np.mean(years)), max(float(np.std(years)), 1.0), y_scale
+    if name == "exponential":
+        return _model_origin(name, years), max(float(np.ptp(years)), 1.0), y_scale
+    if name == "power_law":
+        # the exponent b does not allow a linear rescaling of x
+        return _model_origin(name, years), 1.0, y_scale
+    raise ValueError(f"Unknown model: {name}")
+
+def _param_transform(name, x_offset, x_scale, y_scale):
+    """return : p_scale, p_offset with p = p_scale * p' + p_offset"""
+    if name in ("logistic", "gompertz"):
+        return np.array([y_scale, 1 / x_scale, x_scale]), np.array([0, 0, x_offset])
+    if name == "gaussian":
+        return np.array([y_scale, x_scale, x_scale, x_scale]), np.array([0, 0, 0, x_offset])
+    if name == "exponential":
+        # x is measured from the origin of the model, only the time constant l is scaled
+        return np.array([y_scale, x_scale, 1]), np.zeros(3)
+    if name == "power_law":
+        return np.array([y_scale, 1]), np.zeros(2)
+    raise ValueError(f"Unknown model: {name}")
+
+def default_inputs(name, years, values, preset_year, preset_year_max, values_coeff_max):
+    """
+    Initial parameters and bounds of each model in years and value units
+    Parameters:
+        name: str, one of MODEL_NAMES
+        years: array_like
+        values: array_like
+        preset_year: int, initial guess of the year with the highest growth rate
+        preset_year_max: int, upper bound of the preset year
+        values_coeff_max: float, upper bound of the saturation as multiple of max(values)
+    Return:
+        p0, bounds
+    """
+    years = np.asarray(years, dtype=float)
+    v_max = np.max(values)
+    y_min = np.min(years)
+    span = max(np.ptp(years), 1.0)
+    if name in ("logistic", "gompertz"):
+        return [v_max*3, 0.1, preset_year], \
+            ([v_max*1, 0, y_min], [v_max*values_coeff_max, 5, preset_year_max])
+    if name == "gaussian":
+        return [v_max, span/2, span/2, preset_year], \
+            ([0, 0.1, 0.1, y_min], [v_max*values_coeff_max, 10*span, 10*span, preset_year_max])
+    if name == "exponential":
+        # l is the time constant in years from the first year
+        return [v_max*1.5, span/2, 1], \
+            ([v_max*1, 0, 0], [v_max*values_coeff_max, preset_year_max - y_min, np.inf])
+    if name == "power_law":
+        return [v_max/span, 1], ([0, 0], [np.inf, np.inf])
+    raise ValueError(f"Unknown model: {name}")
+
+def inflection_year(fit):
+    """
+    Year of the highest growth (the preset year) of a fitted model
+    Parameters:
+        fit: dict, result of fit_model
+    Return:
+        float or None (power law has no inflection)
+    """
+    params = fit["params"]
+    if fit["model"] in ("logistic", "gompertz"):
+        return float(params[2])
+    if fit["model"] == "gaussian":
+        return float(params[3])
+    if fit["model"] == "exponential":
+        l, a = params[1], params[2]
+        shift = l * ((a - 1) / a)**(1 / a) if a > 1 else 0.0
+        return float(fit["x_offset"] + shift * fit["x_scale"])
+    return None
+
+# ------------------------------------------------------------
+# Weighted and robust fitting
+LOSSES = ["linear", "soft_l1", "huber", "cauchy", "arctan"]
+# Function evaluations of the short least squares fit that estimates f_scale of a robust fit
+SCALE_MAXFEV = 200
+
+def recency_weights(years, half_life):
+    """
+    Weights that halve every half_life years back from the last year
+    Parameters:
+        years: array_like
+        half_life: float, in years
+    Return:
+        array_like
+    """
+    years = np.asarray(years, dtype=float)
+    return 0.5 ** ((np.max(years) - years) / half_life)
+
+def _loss_weights(residuals, loss, f_scale):
+    """IRLS weights rho'(z) of the scipy losses with z = (r / f_scale)**2"""
+    z = (residuals / f_scale)**2
+    if loss == "soft_l1":
+        return 1 / np.sqrt(1 + z)
+    if loss == "huber":
+        return np.where(z <= 1, 1.0, 1 / np.sqrt(np.maximum(z, 1)))
+    if loss == "cauchy":
+        return 1 / (1 + z)
+    if loss == "arctan":
+        return 1 / (1 + z**2)
+    return np.ones_like(z)
+
+def _robust_scale(residuals):
+    """Scale of the residuals from the median absolute deviation"""
+    mad = 1.4826 * np.median(np.abs(residuals - np.median(residuals)))
+    return mad if mad > 0 else max(np.std(residuals), 1e-12)
+
+def robust_curve_fit(func, x, y, p0, bounds=(-np.inf, np.inf), maxfev=10000, loss="linear",
+                     f_scale=None, weights=None, irls_iterations=0, rtol=1e-6):
+    """
+    curve_fit with per point weights and robust losses
+    Parameters:
+        func: model function f(x, *params)
+        x, y: array_like
+        p0: list, initial parameters
+        bounds: (list, list)
+        maxfev: int
+        loss: str, one of LOSSES
+        f_scale: float, residual size where the robust loss starts, None estimates it from
+                 the residuals (MAD) of a short weighted least squares fit, or of p0 if that
+                 fit does not converge within SCALE_MAXFEV evaluations
+        weights: array_like, optional weight of every point, e.g. recency_weights
+        irls_iterations: int, 0 solves the robust loss directly, > 0 runs that many
+                 iteratively reweighted least squares steps, each warm started from the
+                 previous solution
+        rtol: float, relative change of the parameters that stops the IRLS iterations
+    Return:
+        params, covariance
+    """
+    from scipy.optimize import curve_fit
+    if loss not in LOSSES:
+        raise ValueError(f"Unknown loss: {loss}")
+    y = np.asarray(y, dtype=float)
+    base_sigma = None if weights is None else 1 / np.sqrt(np.asarray(weights, dtype=float))
+    # trf with Jacobian based variable scaling for every fit, also without bounds
+    options = {"method": "trf", "x_scale": "jac", "maxfev": maxfev}
+    if loss == "linear":
+        return curve_fit(func, x, y, p0=p0, bounds=bounds, sigma=base_sigma, **options)
+
+    # The robust fit starts from p0, only an estimate of f_scale needs a least squares fit and
+    # that one is capped, an outlier that keeps it from converging must not stop the robust fit
+    params = np.asarray(p0, dtype=float)
+    if f_scale is None:
+        try:
+            params, _ = curve_fit(func, x, y, p0=p0, bounds=bounds, sigma=base_sigma,
+                                  **dict(options, maxfev=min(maxfev, SCALE_MAXFEV)))
+        except RuntimeError:
+            pass
+    scaled_residuals = (y - func(x, *params)) / (1 if base_sigma is None else base_sigma)
+    if f_scale is None:
+        f_scale = _robust_scale(scaled_residuals)
+    if irls_iterations <= 0:
+        return curve_fit(func, x, y, p0=params, bounds=bounds, sigma=base_sigma,
+                         loss=loss, f_scale=f_scale, **options)
+    for _ in range(irls_iterations):
+        robust_weights = np.maximum(_loss_weights(scaled_residuals, loss, f_scale), 1e-12)
+        sigma = 1 / np.sqrt(robust_weights)
+        if base_sigma is not None:
+            sigma = sigma * base_sigma
+        previous = params
+        params, covariance = curve_fit(func, x, y, p0=previous, bounds=bounds, sigma=sigma, **options)
+        scaled_residuals = (y - func(x, *params)) / (1 if base_sigma is None else base_sigma)
+        if np.all(np.abs(params - previous) <= rtol * np.maximum(np.abs(previous), 1e-12)):
+            break
+    return params, covariance
+
+def fit_model(name, years, values, preset_year, preset_year_max, values_coeff_max=10, maxfev=10000,
+              p0=None, bounds=None, loss="linear", f_scale=None, weights=None, irls_iterations=0):
+    """
+    Fit one of the growth models to the data
+    Parameters:
+        name: str, one of MODEL_NAMES
+        years: array_like
+        values: array_like
+        preset_year: int, initial guess of the year with the highest growth rate
+        preset_year_max: int, upper bound of the preset year
+        values_coeff_max: float, upper bound of the saturation as multiple of max(values)
+        maxfev: int
+        p0: list, optional, replaces the default initial parameters (see default_inputs)
+        bounds: (list, list), optional, replaces the default bounds, both in years and value units
+        loss, f_scale, weights, irls_iterations: see robust_curve_fit
+    Return:
+        dict with "model", "params", "covariance", "x_offset", "x_scale", "n_obs",
+        "residual_variance"
+    """
+    default_p0, default_bounds = default_inputs(
+        name, years, values, preset_year, preset_year_max, values_coeff_max)
+    p0 = np.asarray(default_p0 if p0 is None else p0, dtype=float)
+    lower, upper = default_bounds if bounds is None else bounds
+    lower = np.broadcast_to(np.asarray(lower, dtype=float), p0.shape)
+    upper = np.broadcast_to(np.asarray(upper, dtype=float), p0.shape)
+
+    # Solve on the scaled problem
+    values = np.asarray(values, dtype=float)
+    x_offset, x_scale, y_scale = _solver_scaling(name, years, values)
+    p_scale, p_offset = _param_transform(name, x_offset, x_scale, y_scale)
+    x = (np.asarray(years, dtype=float) - x_offset) / x_scale
+    scaled_lower = (lower - p_offset) / p_scale
+    scaled_upper = (upper - p_offset) / p_scale
+    scaled_p0 = np.clip((p0 - p_offset) / p_scale, scaled_lower, scaled_upper)
+    scaled_params, scaled_covariance = robust_curve_fit(
+        MODEL_FUNCTIONS[name], x, values / y_scale, scaled_p0, (scaled_lower, scaled_upper), maxfev,
+        loss, None if f_scale is None else f_scale / y_scale, weights, irls_iterations
+    )
+
+    # Back to years and value units
+    params = p_scale * scaled_params + p_offset
+    covariance = p_scale[:, None] * scaled_covariance * p_scale[None, :]
+    fit = {
+        "model": name,
+        "params": params,
+        "covariance": covariance,
+        "x_offset": _model_origin(name, years),
+        "x_scale": 1.0,
+        "n_obs": len(values),
+    }
+    residuals = values - predict(fit, years)
+    fit["residual_variance"] = np.sum(residuals**2) / max(len(residuals) - len(params), 1)
+    return fit
+
+def fit_panel(name, panel, preset_year, preset_year_max, values_coeff_max=10, maxfev=10000, **options):
+    """
+    Fit one model to every series of a Series_panel.SeriesPanel on its valid observations
+    Parameters:
+        name: str, one of MODEL_NAMES
+        panel: SeriesPanel
+        options: keyword arguments of fit_model (p0, bounds, loss, ...), "weights" may be a
+                 function of the years of a series, e.g. lambda years: recency_weights(years, 10)
+    Return:
+        list of fit dicts, None for a series that could not be fitted
+    """
+    weights = options.pop("weights", None)
+    fits = []
+    for i in range(len(panel)):
+        years, values = panel.row(i)
+        if len(years) <= len(MODEL_PARAMS[name]):
+            fits.append(None)
+            continue
+        series_weights = weights(years) if callable(weights) else weights
+        try:
+            fits.append(fit_model(name, years, values, preset_year, preset_year_max, values_coeff_max,
+                                  maxfev, weights=series_weights, **options))
+        except (RuntimeError, ValueError):
+            fits.append(None)
+    return fits
+
+def manual_fit(name, years, values, params):
+    """
+    A fit dict for hand-picked parameters (e.g. the manual scenario of Logistic_auto_manual),
+    the covariance is estimated from the data as in Confidence_intervals.covariance_matrix
+    Parameters:
+        name: str, one of MODEL_NAMES
+        years: array_like
+        values: array_like
+        params: list, in the same parameterisation as fit_model
+    Return:
+        dict, see fit_model
+    """
+    import Confidence_intervals as ci
+    fit = {"model": name, "params": np.asarray(params, dtype=float),
+           "x_offset": _model_origin(name, years), "x_scale": 1.0, "n_obs": len(values)}
+    x = scale_years(fit, years)
+    fit["covariance"] = ci.covariance_matrix(MODEL_FUNCTIONS[name], x, np.asarray(values, dtype=float),
+                                             fit["params"])
+    fit["residual_variance"] = ci.residual_variance(MODEL_FUNCTIONS[name], x, values, fit["params"])
+    return fit
+
+def predict(fit, years):
+    """
+    Evaluate a fitted model on the given years
+    Parameters:
+        fit: dict, result of fit_model
+        years: array_like
+    Return:
+        array_like
+    """
+    return MODEL_FUNCTIONS[fit["model"]](scale_years(fit, years), *fit["params"])
+
+def scale_years(fit, years):
+    """return : array_like, the years in the input scale of the fitted model"""
+    return (np.asarray(years, dtype=float) - fit["x_offset"]) / fit["x_scale"]
+
+def predict_bands(fits, years, covariance_level=75, z_t="t", method="delta", prediction_interval=False):
+    """
+    Confidence bands of many fits at once
+    Parameters:
+        fits: list of dict, results of fit_model
+        years: array_like for all fits, or a list with one array_like per fit
+        covariance_level: int, in precentage[0, 100]
+        z_t: str, "z" or "t"
+        method: str, "delta" propagates the covariance through the model Jacobian (see
+                Confidence_intervals.delta_method_bands), "params" evaluates the model at the
+                lower and upper parameter vectors (Confidence_intervals.covariance_params)
+        prediction_interval: bool, add the residual variance (only for "delta")
+    Return:
+        list of (lower, upper), one per fit
+    """
+    import Confidence_intervals as ci
+    if not isinstance(years, list):
+        years = [years] * len(fits)
+    if method == "params":
+        bands = []
+        for fit, fit_years in zip(fits, years):
+            lower_params, upper_params = ci.covariance_params(
+                covariance_level, np.arange(fit["n_obs"]), fit["params"], fit["covariance"], z_t)
+            bands.append((predict(dict(fit, params=lower_params), fit_years),
+                          predict(dict(fit, params=upper_params), fit_years)))
+        return bands
+    if method != "delta":
+        raise ValueError(f"Unknown band method: {method}")
+
+    # Stack the fits with the same number of parameters and solve each group in one einsum
+    bands = [None] * len(fits)
+    groups = {}
+    for i, fit in enumerate(fits):
+        groups.setdefault(len(fit["params"]), []).append(i)
+    for n_params, indices in groups.items():
+        n_years = max(len(years[i]) for i in indices)
+        predictions = np.zeros((len(indices), n_years))
+        jacobians = np.zeros((len(indices), n_years, n_params))
+        for row, i in enumerate(indices):
+            fit = fits[i]
+            x = scale_years(fit, years[i])
+            predictions[row, :len(x)] = MODEL_FUNCTIONS[fit["model"]](x, *fit["params"])
+            jacobians[row, :len(x)] = ci.model_jacobian(MODEL_FUNCTIONS[fit["model"]], x, fit["params"])
+        covariances = np.stack([fits[i]["covariance"] for i in indices])
+        dof = np.array([fits[i]["n_obs"] - n_params for i in indices])
+        residual_variances = np.array([fits[i]["residual_variance"] for i in indices]) \
+            if prediction_interval else None
+        lower, upper = ci.delta_method_bands(
+            predictions, jacobians, covariances,
+            ci.critical_value(covariance_level, dof, z_t), residual_variances)
+        for row, i in enumerate(indices):
+            bands[i] = (lower[row, :len(years[i])], upper[row, :len(years[i])])
+    return bands
@@ -4,10 +4,9 @@ Description: Show the difference between the auto and manual logistic models.
 Author: Kaiyu Qian
 """
 import numpy as np
-import pandas as pd
 from scipy.optimize import curve_fit
-import matplotlib.pyplot as plt
 import Confidence_intervals as ci
+import Growth_models as gm
 
 # Location of the data
 file = r"Installation.xlsx" #in the same folder
@@ -36,10 +35,7 @@ covariance_level = 75 # in percentage [0,100] %
 covariance_mode = "t" # "z" or "t"
 
 # Read the data
-data = pd.read_excel(file, header=0, usecols=cols, sheet_name=sheet)
-data.dropna( inplace=True)
-years = data.iloc[:,0].astype(int).tolist()
-values = data.iloc[:,1].astype(float).tolist()
+years, values, value_label = gm.load_series(file, cols, sheet)
 
 # Logistic function
 def logistic_growth(x, k, b, x0):
@@ -86,6 +82,7 @@ if show_maual:
     manual_prediced_upper = logistic_growth(covariance_years, *manual_params_upper)
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
     plt.figure(num="auto and manual ", figsize=(10, 6))
     plt.scatter(years, values, color="black", label="Original Data")
     if show_auto:
@@ -99,7 +96,7 @@ if __name__ == "__main__":
             plt.fill_between(covariance_years, manual_prediced_lower, manual_prediced_upper, color="red", alpha=0.2)
         plt.axvline(x=x0_m, linestyle="-", color="red", label=f"preset year: {x0_m}")
     plt.gcf().set_tight_layout(True)
-    plt.ylabel(data.columns[1])
+    plt.ylabel(value_label)
     plt.legend()
     plt.grid(True)
     plt.show()
\ No newline at end of file
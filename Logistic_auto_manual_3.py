@@ -1,7 +1,7 @@
 import numpy as np
 import pandas as pd
 from scipy.optimize import curve_fit
-import matplotlib.pyplot as plt
+from Series_panel import SeriesPanel
 
 # --- Einstellungen ---
 file_path = r"Installation.xlsx"  # Pfad zur Originaldatei
@@ -29,20 +29,15 @@ def logistic_growth(x, K, b, x0):
     return K / (1 + np.exp(-b * (x - x0)))
 
 # --- Daten einlesen ---
-data = pd.read_excel(file_path, sheet_name=sheet, header=0, usecols=data_cols)
-data.dropna(inplace=True)
-# data = data.iloc[jump:]
 # Annahme: Die erste Spalte enthält die Jahre, die zweite die beobachteten Werte
-year_col = data.columns[0]
-value_col = data.columns[1]
+year_letter, value_letter = data_cols.split(",")
+panel = SeriesPanel.from_excel(file_path, year_letter, [value_letter], sheet)
+year_col = panel.year_name
+value_col = panel.names[0]
 
-# Konvertierung der Spalten (falls notwendig)
-data[year_col] = data[year_col].astype(int)
-data[value_col] = data[value_col].astype(float)
-
-# Für den Fit benötigen wir Listen bzw. Arrays:
-years = data[year_col].tolist()
-values = data[value_col].tolist()
+# Jahre und Werte der gültigen Beobachtungen als Arrays, ohne Kopie der ganzen Tabelle
+years, values = panel.series(0)
+# years, values = years[jump:], values[jump:]
 
 # --- Automatischer Fit des logistischen Modells ---
 try:
@@ -67,23 +62,11 @@ if logistic_params is not None:
 else:
     logistic_auto_values = np.full_like(all_years, np.nan, dtype=float)
 
-# --- Definition der manuellen Piecewise-Blended-Funktion ---
-def manual_piecewise_blended(x):
-    if x <= manual_cutoff_year:
-        # Falls x nicht exakt in den Originaljahren vorhanden ist, erfolgt die Interpolation
-        return np.interp(x, years, values)
-    elif x > manual_cutoff_year + transition_width:
-        return logistic_growth(x, manual_K, manual_b, manual_x0)
-    else:
-        # Blending: Gewicht steigt linear von 0 bis 1 im Übergangsbereich
-        weight = (x - manual_cutoff_year) / transition_width
-        observed = np.interp(x, years, values)
-        logistic_val = logistic_growth(x, manual_K, manual_b, manual_x0)
-        return (1 - weight) * observed + weight * logistic_val
-
-# Vektorisiere die Funktion, um sie auf den gesamten Jahresbereich anzuwenden
-vec_manual_piecewise_blended = np.vectorize(manual_piecewise_blended)
-manual_piecewise_values = vec_manual_piecewise_blended(all_years)
+# --- Manuelle Piecewise-Blended-Prognose ---
+# Bis manual_cutoff_year die (interpolierten) Originaldaten, danach steigt das Gewicht der
+# logistischen Kurve linear von 0 bis 1 im Übergangsbereich
+manual_piecewise_values = panel.blend(
+    all_years, logistic_growth(all_years, manual_K, manual_b, manual_x0), manual_cutoff_year, transition_width)[0]
 
 # --- Neue DataFrame mit vollständigem Jahresbereich und Prognosewerten ---
 df_output = pd.DataFrame({
@@ -98,14 +81,16 @@ df_output = pd.DataFrame({
 # print(f"Neue Daten wurden in {output_file} gespeichert.")
 
 # --- Plot ---
-plt.figure(num="auto vs manual", figsize=(10, 6))
-plt.scatter(years, values, color="black", label="Originaldaten")
-if logistic_params is not None:
-    plt.plot(all_years, logistic_auto_values, linestyle="--", color="blue", label="Logistic auto")
-plt.plot(all_years, manual_piecewise_values, linestyle="--", color="red", label="Manuell (Piecewise mit Blending)")
-plt.gcf().set_tight_layout(True)
-plt.xlabel("Jahr")
-plt.ylabel(value_col)
-plt.legend()
-plt.grid(True)
-plt.show()
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    plt.figure(num="auto vs manual", figsize=(10, 6))
+    plt.scatter(years, values, color="black", label="Originaldaten")
+    if logistic_params is not None:
+        plt.plot(all_years, logistic_auto_values, linestyle="--", color="blue", label="Logistic auto")
+    plt.plot(all_years, manual_piecewise_values, linestyle="--", color="red", label="Manuell (Piecewise mit Blending)")
+    plt.gcf().set_tight_layout(True)
+    plt.xlabel("Jahr")
+    plt.ylabel(value_col)
+    plt.legend()
+    plt.grid(True)
+    plt.show()
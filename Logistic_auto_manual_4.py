@@ -1,7 +1,8 @@
 import numpy as np
 import pandas as pd
 from scipy.optimize import curve_fit
-import matplotlib.pyplot as plt
+import Prognosis_ensemble as pe
+from Series_panel import SeriesPanel
 
 # --- Einstellungen ---
 file_path = r"Installation.xlsx"  # Pfad zur Originaldatei
@@ -24,24 +25,22 @@ manual_K = 315
 manual_b = 0.18
 manual_x0 = 2033
 
+# Ensemble aus automatischem und manuellem Szenario
+ensemble_weight_manual = 0.5  # Gewicht des manuellen Szenarios (0-1), der Rest geht an den auto Fit
+
 # --- Funktion zur Berechnung der logistischen Wachstumskurve ---
 def logistic_growth(x, K, b, x0):
     return K / (1 + np.exp(-b * (x - x0)))
 
 # --- Daten einlesen ---
-data = pd.read_excel(file_path, header=0, sheet_name=sheet, usecols=data_cols)
-data.dropna(inplace=True)
 # Annahme: Die erste Spalte enthält die Jahre, die zweite die beobachteten Werte
-year_col = data.columns[0]
-value_col = data.columns[1]
-
-# Konvertierung der Spalten (falls notwendig)
-data[year_col] = data[year_col].astype(int)
-data[value_col] = data[value_col].astype(float)
+year_letter, value_letter = data_cols.split(",")
+panel = SeriesPanel.from_excel(file_path, year_letter, [value_letter], sheet)
+year_col = panel.year_name
+value_col = panel.names[0]
 
-# Für den Fit benötigen wir Listen bzw. Arrays:
-years = data[year_col].tolist()
-values = data[value_col].tolist()
+# Jahre und Werte der gültigen Beobachtungen als Arrays, ohne Kopie der ganzen Tabelle
+years, values = panel.series(0)
 
 # --- Automatischer Fit des logistischen Modells ---
 try:
@@ -60,64 +59,51 @@ except RuntimeError as e:
 # --- Erzeuge einen vollständigen Jahresbereich ---
 all_years = np.arange(min(years), end_year + 1)
 
-# --- Definition der automatischen Piecewise-Blended-Funktion ---
-# Hier wird sichergestellt, dass für x <= manual_cutoff_year der Wert exakt aus den Originaldaten (mittels Interpolation) kommt.
+# --- Automatische Piecewise-Blended-Prognose ---
+# Hier wird sichergestellt, dass für x <= manual_cutoff_year der Wert exakt aus den Originaldaten (mittels Interpolation) kommt,
+# im Übergangsbereich steigt das Gewicht der logistischen Kurve linear von 0 bis 1.
 if logistic_params is not None:
-    def auto_piecewise_blended(x):
-        if x <= manual_cutoff_year:
-            return np.interp(x, years, values)
-        elif x > manual_cutoff_year + transition_width:
-            return logistic_growth(x, *logistic_params)
-        else:
-            # Blending im Übergangsbereich
-            weight = (x - manual_cutoff_year) / transition_width
-            observed = np.interp(x, years, values)
-            logistic_val = logistic_growth(x, *logistic_params)
-            return (1 - weight) * observed + weight * logistic_val
-
-    vec_auto_piecewise = np.vectorize(auto_piecewise_blended)
-    auto_piecewise_values = vec_auto_piecewise(all_years)
+    auto_piecewise_values = panel.blend(
+        all_years, logistic_growth(all_years, *logistic_params), manual_cutoff_year, transition_width)[0]
 else:
     # Falls der Fit fehlschlägt, nutzen wir für die automatische Kurve die Originaldaten
     auto_piecewise_values = np.interp(all_years, years, values)
 
-# --- Definition der manuellen Piecewise-Blended-Funktion ---
-def manual_piecewise_blended(x):
-    if x <= manual_cutoff_year:
-        # Exakte Übernahme der Originaldaten (bei fehlendem exaktem x erfolgt Interpolation)
-        return np.interp(x, years, values)
-    elif x > manual_cutoff_year + transition_width:
-        return logistic_growth(x, manual_K, manual_b, manual_x0)
-    else:
-        # Blending: Gewicht steigt linear von 0 bis 1 im Übergangsbereich
-        weight = (x - manual_cutoff_year) / transition_width
-        observed = np.interp(x, years, values)
-        logistic_val = logistic_growth(x, manual_K, manual_b, manual_x0)
-        return (1 - weight) * observed + weight * logistic_val
-
-vec_manual_piecewise = np.vectorize(manual_piecewise_blended)
-manual_piecewise_values = vec_manual_piecewise(all_years)
+# --- Manuelle Piecewise-Blended-Prognose ---
+manual_piecewise_values = panel.blend(
+    all_years, logistic_growth(all_years, manual_K, manual_b, manual_x0), manual_cutoff_year, transition_width)[0]
+
+# --- Ensemble: gewichteter Mittelwert und Streuung der beiden Szenarien ---
+ensemble = pe.combine(np.stack([auto_piecewise_values, manual_piecewise_values])[None],
+                      pe.constrain_weights([[1 - ensemble_weight_manual, ensemble_weight_manual]]))
+ensemble_values = ensemble["mean"][0]
+ensemble_spread = ensemble["spread"][0]
 
 # --- Neue DataFrame mit vollständigem Jahresbereich und Prognosewerten ---
 df_output = pd.DataFrame({
     year_col: all_years,
     'Auto_Piecewise_Blended': auto_piecewise_values,
-    'Manual_Piecewise_Blended': manual_piecewise_values
+    'Manual_Piecewise_Blended': manual_piecewise_values,
+    'Ensemble_Mean': ensemble_values,
+    'Ensemble_Spread': ensemble_spread
 })
 
 # --- Ausgabe der aktualisierten Datei ---
-output_file = f"{data.columns[1]}.xlsx"
+output_file = f"{value_col}.xlsx"
 df_output.to_excel(output_file, index=False)
 print(f"Neue Daten wurden in {output_file} gespeichert.")
 
 # --- Plot ---
-plt.figure(num="auto vs manual", figsize=(10, 6))
-plt.scatter(years, values, color="black", label="Originaldaten")
-plt.plot(all_years, auto_piecewise_values, linestyle="--", color="blue", label="Worstcase scenario (auto)")
-plt.plot(all_years, manual_piecewise_values, linestyle="--", color="red", label="Bestcase scenario (manual)")
-plt.gcf().set_tight_layout(True)
-plt.xlabel("Jahr")
-plt.ylabel(value_col)
-plt.legend()
-plt.grid(True)
-plt.show()
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    plt.figure(num="auto vs manual", figsize=(10, 6))
+    plt.scatter(years, values, color="black", label="Originaldaten")
+    plt.plot(all_years, auto_piecewise_values, linestyle="--", color="blue", label="Worstcase scenario (auto)")
+    plt.plot(all_years, manual_piecewise_values, linestyle="--", color="red", label="Bestcase scenario (manual)")
+    plt.plot(all_years, ensemble_values, linestyle="-", color="purple", label=f"Ensemble ({ensemble_weight_manual:.0%} manual)")
+    plt.gcf().set_tight_layout(True)
+    plt.xlabel("Jahr")
+    plt.ylabel(value_col)
+    plt.legend()
+    plt.grid(True)
+    plt.show()
@@ -0,0 +1,172 @@
+"""
+Date: 19.10.2026
+Description: This module fits the logistic model to several related series at once, e.g. the
+country columns of the "Global Top5" sheet. All series are solved in one sparse least squares
+problem with two optional couplings:
+    - a common prior for the growth rates b, every b_i is pulled towards a shared mean b_mean
+    - a sum constraint, the sum of the regional curves should follow the global series
+Short series borrow strength from the others and one joint solve replaces N multistart fits.
+Author: Kaiyu Qian
+"""
+import numpy as np
+from Growth_models import logistic_growth
+
+def load_panel(file_path, year_col, series_cols, sheet=0, total_col=None):
+    """
+    Read a year column and several value columns on one common year axis
+    Parameters:
+        file_path: str
+        year_col: str, column letter of the years, e.g. "A"
+        series_cols: list of str, column letters of the series, e.g. ["B", "C", "D"]
+        sheet: str or int
+        total_col: str, optional column letter of the global series
+    Return:
+        years: 1-D array
+        values: 2-D array (n_series, n_years), NaN for missing years
+        total: 1-D array or None
+        names: list of str
+    """
+    from Series_panel import SeriesPanel
+    value_cols = list(series_cols) + ([total_col] if total_col else [])
+    panel = SeriesPanel.from_excel(file_path, year_col, value_cols, sheet)
+    n_series = len(series_cols)
+    total = panel.values[n_series] if total_col else None
+    return panel.years, panel.values[:n_series], total, panel.names[:n_series]
+
+def pooled_logistic_fit(years, values, total=None, growth_rate_sd=None, sum_weight=1.0,
+                        preset_year=2026, preset_year_max=2035, values_coeff_max=10,
+                        growth_rate_min=0.0, growth_rate_max=5.0, max_nfev=None):
+    """
+    Fit one logistic curve per series in a single sparse least squares problem
+    Parameters:
+        years: 1-D array, the common year axis
+        values: 2-D array (n_series, n_years), NaN for missing years
+        total: 1-D array, optional global series, the curves are fitted to sum up to it
+        growth_rate_sd: float, optional standard deviation of b_i around the shared b_mean in
+                        units of b, the data rows are weighted by the residual standard deviation
+                        of every series from a first pass without the prior, None fits the growth
+                        rates independently, a small value shares them
+        sum_weight: float, weight of the sum constraint relative to the data
+        preset_year: int, initial guess of x0
+        preset_year_max: int, upper bound of x0
+        values_coeff_max: float, upper bound of K as multiple of max(values_i)
+        growth_rate_min, growth_rate_max: float, bounds of b
+        max_nfev: int
+    Return:
+        fits: list of dict, one fit per series in the format of Growth_models.fit_model
+        info: dict with "growth_rate_mean", "cost", "nfev", "success"
+    """
+    from scipy.optimize import least_squares
+    from scipy.sparse import lil_matrix
+
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n_series = values.shape[0]
+    mask = ~np.isnan(values)
+    scales = np.array([np.nanmax(np.abs(v)) or 1.0 for v in values])
+    use_prior = growth_rate_sd is not None
+    use_total = total is not None
+    if use_total:
+        total = np.asarray(total, dtype=float)
+        total_mask = ~np.isnan(total)
+        total_scale = np.nanmax(np.abs(total)) or 1.0
+        total_weight = np.sqrt(sum_weight)
+
+    # Parameter vector: [K_0, b_0, x0_0, K_1, b_1, x0_1, ..., b_mean]
+    n_params = 3 * n_series + (1 if use_prior else 0)
+    v_max = np.nanmax(values, axis=1)
+    p0 = np.empty(n_params)
+    lower = np.empty(n_params)
+    upper = np.empty(n_params)
+    p0[0:3*n_series:3] = v_max * min(3, values_coeff_max)
+    p0[1:3*n_series:3] = min(max(0.1, growth_rate_min), growth_rate_max)
+    p0[2:3*n_series:3] = min(preset_year, preset_year_max)
+    lower[0:3*n_series:3] = v_max
+    upper[0:3*n_series:3] = v_max * values_coeff_max
+    lower[1:3*n_series:3] = growth_rate_min
+    upper[1:3*n_series:3] = growth_rate_max
+    lower[2:3*n_series:3] = np.min(years)
+    upper[2:3*n_series:3] = preset_year_max
+    if use_prior:
+        p0[-1] = p0[1]
+        lower[-1], upper[-1] = growth_rate_min, growth_rate_max
+
+    # Row layout of the residual vector
+    data_rows = np.cumsum([0] + [int(m.sum()) for m in mask])
+    n_obs = np.diff(data_rows)
+
+    def solve(p_start, noise, total_noise, prior):
+        """Joint least squares fit, the data rows of series i are divided by noise[i]"""
+        n_rows = data_rows[-1]
+        prior_row = n_rows
+        n_rows += n_series if prior else 0
+        total_row = n_rows
+        n_rows += int(total_mask.sum()) if use_total else 0
+
+        def residuals(p):
+            params = p[:3*n_series].reshape(n_series, 3)
+            curves = logistic_growth(years[None, :], params[:, 0:1], params[:, 1:2], params[:, 2:3])
+            res = np.empty(n_rows)
+            res[:data_rows[-1]] = ((curves - np.nan_to_num(values)) / noise[:, None])[mask]
+            if prior:
+                res[prior_row:prior_row + n_series] = (params[:, 1] - p[-1]) / growth_rate_sd
+            if use_total:
+                res[total_row:] = total_weight * (curves.sum(axis=0)[total_mask] - total[total_mask]) / total_noise
+            return res
+
+        # Every data row only depends on the three parameters of its series
+        sparsity = lil_matrix((n_rows, n_params), dtype=int)
+        for i in range(n_series):
+            sparsity[data_rows[i]:data_rows[i + 1], 3*i:3*i + 3] = 1
+            if prior:
+                sparsity[prior_row + i, 3*i + 1] = 1
+                sparsity[prior_row + i, n_params - 1] = 1
+        if use_total:
+            sparsity[total_row:, :3*n_series] = 1
+        return least_squares(residuals, p_start, bounds=(lower, upper), jac_sparsity=sparsity,
+                             x_scale="jac", method="trf", max_nfev=max_nfev)
+
+    def mean_squares(result):
+        """return : mean squared data residual of every series in the units of its rows"""
+        return np.array([np.sum(result.fun[data_rows[i]:data_rows[i + 1]]**2) / max(n_obs[i] - 3, 1)
+                         for i in range(n_series)])
+
+    noise, total_noise = scales, total_scale if use_total else None
+    nfev = 0
+    if use_prior:
+        # growth_rate_sd is a standard deviation in units of b, so the data rows have to be in
+        # units of their noise: a first pass without the prior estimates the residual standard
+        # deviation of every series, the sum constraint keeps its weight relative to the data
+        first = solve(p0, scales, total_noise, False)
+        nfev += first.nfev
+        noise = np.maximum(np.sqrt(mean_squares(first)), 1e-6) * scales
+        total_noise = np.sqrt(np.sum(noise**2)) if use_total else None
+        p0 = first.x.copy()
+        p0[-1] = np.mean(first.x[1:3*n_series:3])
+    result = solve(p0, noise, total_noise, use_prior)
+    nfev += result.nfev
+
+    # Covariance as in curve_fit: (J^T J)^-1 times the residual variance of each series
+    jac = result.jac.toarray() if hasattr(result.jac, "toarray") else result.jac
+    unscaled = np.linalg.pinv(jac.T @ jac)
+
+    fits = []
+    mse = mean_squares(result)
+    for i in range(n_series):
+        block = slice(3*i, 3*i + 3)
+        fits.append({
+            "model": "logistic",
+            "params": result.x[block].copy(),
+            "covariance": unscaled[block, block] * mse[i],
+            "x_offset": 0.0,
+            "x_scale": 1.0,
+            "n_obs": int(n_obs[i]),
+            "residual_variance": mse[i] * noise[i]**2,
+        })
+    info = {
+        "growth_rate_mean": result.x[-1] if use_prior else float(np.mean(result.x[1:3*n_series:3])),
+        "cost": result.cost,
+        "nfev": nfev,
+        "success": result.success,
+    }
+    return fits, info
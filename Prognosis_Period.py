@@ -1,34 +1,20 @@
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from statsmodels.tsa.seasonal import seasonal_decompose
 from scipy.optimize import curve_fit
+from Series_panel import SeriesPanel
 
 # read Excel file
-data = pd.read_excel(r"Prognosis-Datasource.xlsx", usecols="A, E", header=0)
-data.dropna( inplace=True)
-years = data.iloc[:,0].astype(int).tolist()
-values = data.iloc[:,1].astype(float).tolist()
-data.set_index("Jahr", inplace=True)
+panel = SeriesPanel.from_excel(r"Prognosis-Datasource.xlsx", "A", ["E"])
+years, values = panel.series(0)
 
 # Normalization the years
 preset_years = 2020
 future_years = np.arange(np.min(years)-1, 2051)
 
-# Decompose the data
-result = seasonal_decompose(data, model='additive', period=5)
-trend_part = result.trend
-seasonal_part = result.seasonal
-residual_part = result.resid
-
-# Filter out missing values
-valid_indices = ~trend_part.isna()
-filtered_years = np.array(years)[valid_indices]
-filtered_trend = trend_part[valid_indices].values
-
-valid_seasonal = ~seasonal_part.isna()
-filtered_seasonal_years = np.array(years)[valid_seasonal]
-filtered_seasonal = seasonal_part[valid_seasonal].values
+# Decompose the data, the parts keep the year axis of the panel and are only valid
+# where the moving average is defined, so no filtered copies are needed
+parts = panel.decompose(period=5, model='additive')
+filtered_years, filtered_trend = parts["trend"].series(0)
+filtered_seasonal_years, filtered_seasonal = parts["seasonal"].series(0)
 
 # Trend model
 def logistic_model(x, K, b, x0):
@@ -60,10 +46,12 @@ seasonal_pred = sin_model(future_years, *periodic_params)
 future_pred = logistic_predictions + seasonal_pred
 
 # Plot the data
-plt.figure(num=f"Prognosis up to {int(future_years[-1])}", figsize=(16, 9))
-plt.scatter(years, values, color="black", label="Actual Data")
-plt.plot(future_years, future_pred, label="Prediction")
-plt.gcf().set_tight_layout(True)
-plt.title(f"Prognosis up to {int(future_years[-1])}")
-plt.legend()
-plt.show()
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    plt.figure(num=f"Prognosis up to {int(future_years[-1])}", figsize=(16, 9))
+    plt.scatter(years, values, color="black", label="Actual Data")
+    plt.plot(future_years, future_pred, label="Prediction")
+    plt.gcf().set_tight_layout(True)
+    plt.title(f"Prognosis up to {int(future_years[-1])}")
+    plt.legend()
+    plt.show()
@@ -0,0 +1,305 @@
+"""
+Date: 19.10.2026
+Description: This module runs many prognosis jobs from one configuration file instead of editing
+the module constants of the scripts. The configuration is a TOML (or YAML, if PyYAML is installed)
+file with a [defaults] table and a list of [[jobs]]. Every sheet is read only once, the jobs are
+grouped by sheet and the fits run on a process pool.
+Example:
+    python Prognosis_cli.py run --config prognosis_jobs.example.toml
+Author: Kaiyu Qian
+"""
+import itertools
+import os
+import numpy as np
+import Growth_models as gm
+import Prognosis_profile as profile
+
+DEFAULTS = {
+    "file": "Prognosis-Datasource.xlsx",
+    "sheet": 0,
+    "cols": "A, E",
+    "model": "logistic",
+    "end_year": 2050,
+    "preset_year": 2026,
+    "preset_year_max": 2035,
+    "values_coeff_max": 10,
+    "maxfev": 10000,
+    "p0": None,
+    "bounds": None,
+    "params": None,
+    "scenario": None,
+    "series": None,
+    "loss": "linear",
+    "f_scale": None,
+    "recency_half_life": None,
+    "irls_iterations": 0,
+    "covariance_level": 75,
+    "covariance_model": "t",
+    "band_method": "delta",
+    "prediction_interval": False,
+    "backtest_years": None,
+}
+
+# ------------------------------------------------------------
+# Configuration
+def load_config(path):
+    """
+    Read a TOML or YAML job file
+    Parameters:
+        path: str
+    Return:
+        dict with "defaults" and "jobs"
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("PyYAML is required for YAML job files, use TOML instead") from e
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+    else:
+        import tomllib
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    config.setdefault("defaults", {})
+    config.setdefault("jobs", [])
+    config.setdefault("workers", None)
+    config.setdefault("output", "Prognoses-Batch.csv")
+    config.setdefault("export_dir", None)
+    config.setdefault("ensemble", None)
+    return config
+
+def _check_keys(table, where):
+    """Reject misspelled keys, they would otherwise silently fall back to the defaults"""
+    unknown = sorted(set(table) - set(DEFAULTS) - {"name"})
+    if unknown:
+        raise ValueError(f"Unknown key(s) {', '.join(unknown)} in {where}, "
+                         f"allowed are: {', '.join(sorted(DEFAULTS))}, name")
+
+def expand_jobs(config):
+    """
+    Merge the defaults into every job and expand lists of columns and models into single jobs
+    Parameters:
+        config: dict, result of load_config
+    Return:
+        list of dict
+    """
+    _check_keys(config["defaults"], "[defaults]")
+    base = dict(DEFAULTS, **config["defaults"])
+    ensemble = config.get("ensemble") or {}
+    if ensemble.get("weighting") == "backtest" and base["backtest_years"] is None:
+        base["backtest_years"] = ensemble.get("holdout", 3)
+    jobs = []
+    for number, entry in enumerate(config["jobs"], 1):
+        _check_keys(entry, f"job {entry.get('name', number)}")
+        job = dict(base, **entry)
+        cols_list = job["cols"] if isinstance(job["cols"], list) else [job["cols"]]
+        model_list = job["model"] if isinstance(job["model"], list) else [job["model"]]
+        for cols, model in itertools.product(cols_list, model_list):
+            if model not in gm.MODEL_NAMES:
+                raise ValueError(f"Unknown model: {model}")
+            single = dict(job, cols=cols, model=model)
+            if single["scenario"] is None:
+                single["scenario"] = "manual" if single["params"] is not None else "auto"
+            single["name"] = entry.get("name", "job") if len(cols_list) * len(model_list) == 1 \
+                else f"{entry.get('name', 'job')}[{cols}|{model}]"
+            jobs.append(single)
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        # The job name identifies the rows and slices of the export
+        raise ValueError(f"Duplicate job name(s): {', '.join(duplicates)}")
+    return jobs
+
+# ------------------------------------------------------------
+# Data loading
+def _split_cols(cols):
+    """'A, E' -> (0, 4)"""
+    year_col, value_col = cols.split(",")
+    return gm.column_index(year_col), gm.column_index(value_col)
+
+def load_sheets(jobs):
+    """
+    Read every (file, sheet) pair only once with the union of the columns used by its jobs
+    Parameters:
+        jobs: list of dict
+    Return:
+        dict (file, sheet, year column) -> Series_panel.SeriesPanel of the value columns on
+        this year axis, the column positions are the keys of the series
+    """
+    import pandas as pd
+    from Series_panel import SeriesPanel
+    needed = {}
+    for job in jobs:
+        year_col, value_col = _split_cols(job["cols"])
+        needed.setdefault((job["file"], job["sheet"]), {}).setdefault(year_col, set()).add(value_col)
+    sheets = {}
+    for (file, sheet), year_cols in needed.items():
+        columns = sorted(set(year_cols).union(*year_cols.values()))
+        with profile.stage("load"):
+            data = pd.read_excel(file, header=0, sheet_name=sheet, usecols=columns)
+        position = {column: i for i, column in enumerate(columns)}
+        for year_col, value_cols in year_cols.items():
+            value_cols = sorted(value_cols)
+            block = data.iloc[:, [position[year_col]] + [position[column] for column in value_cols]]
+            sheets[(file, sheet, year_col)] = SeriesPanel.from_frame(block, 0, keys=value_cols)
+    return sheets
+
+def job_series(job, sheets):
+    """return : array_like years, array_like values, str column name of the job"""
+    year_col, value_col = _split_cols(job["cols"])
+    panel = sheets[(job["file"], job["sheet"], year_col)]
+    years, values = panel.series(value_col)
+    return years, values, panel.name(value_col)
+
+# ------------------------------------------------------------
+# Job execution
+def _fit_job(job, years, values):
+    """return : fit dict of the job on the given data"""
+    bounds = tuple(job["bounds"]) if job["bounds"] is not None else None
+    weights = gm.recency_weights(years, job["recency_half_life"]) if job["recency_half_life"] else None
+    if job["params"] is not None:
+        return gm.manual_fit(job["model"], years, values, job["params"])
+    return gm.fit_model(job["model"], years, values, job["preset_year"], job["preset_year_max"],
+                        job["values_coeff_max"], job["maxfev"], p0=job["p0"], bounds=bounds,
+                        loss=job["loss"], f_scale=job["f_scale"], weights=weights,
+                        irls_iterations=job["irls_iterations"])
+
+def backtest_error(job, years, values):
+    """
+    Refit the job without its last backtest_years years and return the RMSE of the forecast on
+    these years, manual parameters are checked as they are. NaN if the history is too short.
+    """
+    holdout = int(job["backtest_years"])
+    n_train = len(years) - holdout
+    if holdout <= 0 or n_train <= len(gm.MODEL_PARAMS[job["model"]]):
+        return np.nan
+    try:
+        fit = _fit_job(job, years[:n_train], values[:n_train])
+    except (RuntimeError, ValueError):
+        return np.nan
+    return float(np.sqrt(np.mean((gm.predict(fit, years[n_train:]) - values[n_train:])**2)))
+
+def run_job(job, years, values):
+    """
+    Fit the model of one job and compute its prediction, the bands follow in add_bands
+    Parameters:
+        job: dict
+        years: array_like
+        values: array_like
+    Return:
+        dict
+    """
+    result = {"job": job, "years": years, "values": values, "fit": None, "error": None}
+    try:
+        with profile.stage("fit"):
+            fit = _fit_job(job, years, values)
+    except (RuntimeError, ValueError) as e:
+        result["error"] = str(e)
+        return result
+    future_years = np.arange(np.min(years) - 1, job["end_year"] + 1)
+    result.update({
+        "fit": fit,
+        "r2": gm.r2_score(values, gm.predict(fit, years)),
+        "future_years": future_years,
+        "prediction": gm.predict(fit, future_years),
+        "covariance_years": np.arange(np.max(years), job["end_year"] + 1),
+    })
+    if job["backtest_years"]:
+        with profile.stage("fit"):
+            result["backtest_error"] = backtest_error(job, years, values)
+    return result
+
+def add_bands(results):
+    """
+    Compute the confidence bands of all successful results, the jobs with the same band
+    settings are handled together in one Growth_models.predict_bands call
+    Parameters:
+        results: list of dict, result of run_job, "lower" and "upper" are added in place
+    """
+    groups = {}
+    for result in results:
+        if result["fit"] is not None:
+            job = result["job"]
+            key = (job["covariance_level"], job["covariance_model"], job["band_method"],
+                   job["prediction_interval"])
+            groups.setdefault(key, []).append(result)
+    for (level, z_t, method, prediction_interval), group in groups.items():
+        with profile.stage("band"):
+            bands = gm.predict_bands([r["fit"] for r in group], [r["covariance_years"] for r in group],
+                                     level, z_t, method, prediction_interval)
+        for result, (lower, upper) in zip(group, bands):
+            result["lower"], result["upper"] = lower, upper
+
+def _run_job_profiled(job, years, values):
+    """run_job in a pool worker, return : (result, profile records of the worker)"""
+    return run_job(job, years, values), profile.drain()
+
+def run_jobs(jobs, workers=None):
+    """
+    Load the data of all jobs, grouped by sheet, and run the fits on a process pool
+    Parameters:
+        jobs: list of dict
+        workers: int, number of processes, 1 runs in this process
+    Return:
+        list of dict, grouped by file and sheet
+    """
+    sheets = load_sheets(jobs)
+    jobs = sorted(jobs, key=lambda job: (str(job["file"]), str(job["sheet"])))
+    tasks = []
+    for job in jobs:
+        years, values, column_name = job_series(job, sheets)
+        tasks.append((dict(job, series=job["series"] or column_name), years, values))
+    if workers == 1 or len(tasks) <= 1:
+        results = [run_job(*task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=profile.init_worker,
+                                 initargs=(profile.worker_options(),)) as pool:
+            for result, records in pool.map(_run_job_profiled, *zip(*tasks)):
+                profile.merge(records)
+                results.append(result)
+    add_bands(results)
+    return results
+
+def write_results(results, output):
+    """
+    Write the predictions of all jobs into one long CSV file and the parameters next to it
+    Parameters:
+        results: list of dict, result of run_jobs
+        output: str, CSV file name, the parameters go to <output>-params.csv
+    """
+    with profile.stage("export"):
+        _write_results(results, output)
+    print(f"\n{len(results)} jobs have been saved to '{output}' and '{_params_output(output)}'")
+
+def _params_output(output):
+    return f"{os.path.splitext(output)[0]}-params.csv"
+
+def _write_results(results, output):
+    import pandas as pd
+    frames, rows = [], []
+    for result in results:
+        job = result["job"]
+        row = {"Job": job["name"], "Sheet": job["sheet"], "Series": job["series"],
+               "Model": gm.MODEL_LABELS[job["model"]], "Scenario": job["scenario"],
+               "Error": result["error"]}
+        if result["fit"] is not None:
+            row.update({"R2": result["r2"],
+                        "Params": " ".join(f"{p:.6g}" for p in result["fit"]["params"])})
+            frame = pd.DataFrame({"Year": result["future_years"], "Prediction": result["prediction"]})
+            band = pd.DataFrame({"Year": result["covariance_years"],
+                                 "Lower": result["lower"], "Upper": result["upper"]})
+            frame = frame.merge(band, on="Year", how="left")
+            frame.insert(0, "Scenario", job["scenario"])
+            frame.insert(0, "Model", row["Model"])
+            frame.insert(0, "Series", job["series"])
+            frame.insert(0, "Sheet", job["sheet"])
+            frame.insert(0, "Job", job["name"])
+            frames.append(frame)
+        rows.append(row)
+    if frames:
+        pd.concat(frames, ignore_index=True).to_csv(output, index=False)
+    pd.DataFrame(rows).to_csv(_params_output(output), index=False)
@@ -0,0 +1,329 @@
+"""
+Date: 19.10.2026
+Description: Command line entry point for the prognosis scripts. The subcommands fit, predict,
+band, sweep and export work on one series of an Excel file, pool fits related columns jointly
+(see Pooled_fit), run executes a job configuration file (see Prognosis_batch) and render draws
+the charts of an export (see Prognosis_render). Plotting, pandas, scipy.stats and the other heavy
+libraries are only imported by the subcommands that need them, so a headless fit in a cron job
+does not pay for matplotlib.
+Example:
+    python Prognosis_cli.py fit --file Prognosis-Datasource.xlsx --cols "A, E" --model logistic
+    python Prognosis_cli.py band --level 75 --mode t --plot
+    python Prognosis_cli.py pool --sheet "Global Top5" --series B C D --total E --growth-rate-sd 0.05
+    python Prognosis_cli.py run --config prognosis_jobs.example.toml --workers 4
+    python Prognosis_cli.py run --config prognosis_jobs.example.toml --ensemble Prognoses-Ensemble.csv
+    python Prognosis_cli.py render --export-dir Prognoses-Export --format svg
+    python Prognosis_cli.py run --config jobs.toml --profile-cprofile --profile-output profile
+Author: Kaiyu Qian
+"""
+import argparse
+import sys
+import numpy as np
+import Growth_models as gm
+import Prognosis_profile as profile
+
+# ------------------------------------------------------------
+# Helpers
+def _fit_all(args, years, values):
+    """return : dict of model name -> fit dict (None if the fit failed)"""
+    fits = {}
+    for name in args.model:
+        try:
+            with profile.stage("fit"):
+                fits[name] = gm.fit_model(
+                    name, years, values, args.preset_year, args.preset_year_max,
+                    args.values_coeff_max, args.maxfev, **_robust_options(args, years))
+        except (RuntimeError, ValueError) as e:
+            print(f"{gm.MODEL_LABELS[name]} model fitting failed: {e}", file=sys.stderr)
+            fits[name] = None
+    return fits
+
+def _robust_options(args, years):
+    """return : dict of the loss and weight keyword arguments of Growth_models.fit_model"""
+    weights = gm.recency_weights(years, args.recency_half_life) if args.recency_half_life else None
+    return {"loss": args.loss, "f_scale": args.f_scale, "weights": weights,
+            "irls_iterations": args.irls}
+
+def _future_years(args, years):
+    return np.arange(np.min(years) - 1, args.end_year + 1)
+
+def _predictions(args, years, fits):
+    """return : dict column -> array_like, starting with the "Year" column"""
+    future_years = _future_years(args, years)
+    result = {"Year": future_years}
+    for name, fit in fits.items():
+        result[gm.MODEL_LABELS[name]] = gm.predict(fit, future_years) if fit is not None else None
+    return result
+
+def _plot(years, values, curves, title, value_label, bands=None):
+    """
+    Show the data and the curves
+    Parameters:
+        curves: dict label -> (x, y)
+        bands: dict label -> (x, lower, upper)
+    """
+    import matplotlib.pyplot as plt
+    with profile.stage("plot"):
+        plt.figure(num=title, figsize=(10, 6))
+        plt.scatter(years, values, color="black", label="Original Data")
+        for label, (x, y) in curves.items():
+            plt.plot(x, y, linestyle="--", label=label)
+        for label, (x, lower, upper) in (bands or {}).items():
+            plt.fill_between(x, lower, upper, alpha=0.2, label=label)
+        plt.gcf().set_tight_layout(True)
+        plt.title(title)
+        plt.ylabel(value_label)
+        plt.legend()
+        plt.grid(True)
+    plt.show()
+
+def _write_csv(columns, output):
+    import pandas as pd
+    with profile.stage("export"):
+        pd.DataFrame(columns).to_csv(output, index=False)
+    print(f"\nResult has been saved to '{output}'")
+
+def _parse_range(text):
+    """'2020:2030' -> [2020, ..., 2030], '3,5,10' -> [3.0, 5.0, 10.0]"""
+    if ":" in text:
+        start, stop = text.split(":")
+        return list(range(int(start), int(stop) + 1))
+    return [float(v) for v in text.split(",")]
+
+# ------------------------------------------------------------
+# Subcommands
+def cmd_fit(args):
+    years, values, value_label = gm.load_series(args.file, args.cols, args.sheet)
+    fits = _fit_all(args, years, values)
+    for name, fit in fits.items():
+        if fit is None:
+            continue
+        params = ", ".join(f"{p:.5g}" for p in fit["params"])
+        r2 = gm.r2_score(values, gm.predict(fit, years))
+        print(f"{gm.MODEL_LABELS[name]}: params=[{params}], R2={r2:.4f}")
+    if args.plot:
+        columns = _predictions(args, years, fits)
+        curves = {label: (columns["Year"], y) for label, y in columns.items()
+                  if label != "Year" and y is not None}
+        _plot(years, values, curves, "Fitted models", value_label)
+
+def cmd_predict(args):
+    years, values, value_label = gm.load_series(args.file, args.cols, args.sheet)
+    columns = _predictions(args, years, _fit_all(args, years, values))
+    _write_csv(columns, args.output)
+    if args.plot:
+        curves = {label: (columns["Year"], y) for label, y in columns.items()
+                  if label != "Year" and y is not None}
+        _plot(years, values, curves, f"The different prognoses up to {args.end_year}", value_label)
+
+def cmd_band(args):
+    years, values, value_label = gm.load_series(args.file, args.cols, args.sheet)
+    fits = {name: fit for name, fit in _fit_all(args, years, values).items() if fit is not None}
+    covariance_years = np.arange(np.max(years), args.end_year + 1)
+    with profile.stage("band"):
+        band_list = gm.predict_bands(list(fits.values()), covariance_years, args.level, args.mode,
+                                     args.method, args.prediction)
+    columns = {"Year": covariance_years}
+    curves, bands = {}, {}
+    for (name, fit), (lower, upper) in zip(fits.items(), band_list):
+        label = gm.MODEL_LABELS[name]
+        columns[f"{label} Lower"] = lower
+        columns[f"{label} exact"] = gm.predict(fit, covariance_years)
+        columns[f"{label} Upper"] = upper
+        curves[label] = (covariance_years, columns[f"{label} exact"])
+        bands[f"{label} ({args.mode}) {args.level}%"] = (
+            covariance_years, columns[f"{label} Lower"], columns[f"{label} Upper"])
+    _write_csv(columns, args.output)
+    if args.plot:
+        _plot(years, values, curves, "Confidence intervals", value_label, bands)
+
+def cmd_sweep(args):
+    years, values, _ = gm.load_series(args.file, args.cols, args.sheet)
+    preset_years = _parse_range(args.preset_years) if args.preset_years else [args.preset_year]
+    coeffs = _parse_range(args.coeffs) if args.coeffs else [args.values_coeff_max]
+    rows = {"Model": [], "Preset Year": [], "Coeff Max": [], "R2": [], "Params": []}
+    for name in args.model:
+        for preset_year in preset_years:
+            for coeff in coeffs:
+                try:
+                    fit = gm.fit_model(name, years, values, preset_year, args.preset_year_max,
+                                       coeff, args.maxfev, **_robust_options(args, years))
+                except (RuntimeError, ValueError):
+                    continue
+                r2 = gm.r2_score(values, gm.predict(fit, years))
+                rows["Model"].append(gm.MODEL_LABELS[name])
+                rows["Preset Year"].append(preset_year)
+                rows["Coeff Max"].append(coeff)
+                rows["R2"].append(r2)
+                rows["Params"].append(" ".join(f"{p:.5g}" for p in fit["params"]))
+                print(f"{gm.MODEL_LABELS[name]} preset_year={preset_year} coeff={coeff}: R2={r2:.4f}")
+    if args.output:
+        _write_csv(rows, args.output)
+
+def cmd_export(args):
+    years, values, _ = gm.load_series(args.file, args.cols, args.sheet)
+    columns = _predictions(args, years, _fit_all(args, years, values))
+    _write_csv(columns, args.output)
+    growth_rates = {"Year": columns["Year"][1:]}
+    for label, y in columns.items():
+        if label != "Year" and y is not None:
+            growth_rates[label] = np.diff(y) / y[:-1]
+    _write_csv(growth_rates, args.growth_output)
+
+def cmd_pool(args):
+    import Pooled_fit as pf
+    years, values, total, names = pf.load_panel(
+        args.file, args.year_col, args.series, args.sheet, args.total)
+    fits, info = pf.pooled_logistic_fit(
+        years, values, total, args.growth_rate_sd, args.sum_weight, args.preset_year,
+        args.preset_year_max, args.values_coeff_max, max_nfev=args.maxfev)
+    print(f"Pooled fit: success={info['success']}, nfev={info['nfev']}, "
+          f"b_mean={info['growth_rate_mean']:.5f}")
+    future_years = np.arange(np.min(years) - 1, args.end_year + 1)
+    columns = {"Year": future_years}
+    for name, fit in zip(names, fits):
+        K, b, x0 = fit["params"]
+        print(f"{name}: K={K:.2f}, b={b:.5f}, x0={x0:.1f}")
+        columns[name] = gm.predict(fit, future_years)
+    columns["Sum"] = np.sum([columns[name] for name in names], axis=0)
+    _write_csv(columns, args.output)
+    if args.plot:
+        curves = {label: (future_years, y) for label, y in columns.items() if label != "Year"}
+        _plot(np.tile(years, len(names)), values.ravel(), curves, "Pooled logistic fit", "")
+
+def cmd_run(args):
+    import Prognosis_batch as batch
+    config = batch.load_config(args.config)
+    jobs = batch.expand_jobs(config)
+    workers = args.workers if args.workers is not None else config["workers"]
+    results = batch.run_jobs(jobs, workers)
+    for result in results:
+        if result["error"] is not None:
+            print(f"{result['job']['name']} failed: {result['error']}", file=sys.stderr)
+    batch.write_results(results, args.output or config["output"])
+    export_dir = args.export or config["export_dir"]
+    if export_dir:
+        import Prognosis_export
+        Prognosis_export.write_dataset(results, export_dir)
+    ensemble = dict(config["ensemble"] or {})
+    ensemble_output = args.ensemble or ensemble.get("output")
+    if ensemble_output:
+        import Prognosis_ensemble
+        Prognosis_ensemble.write_ensemble(
+            results, ensemble_output, ensemble.get("weighting", "equal"), ensemble.get("weights"),
+            ensemble.get("quantiles", (0.1, 0.5, 0.9)), ensemble.get("power", 2.0),
+            ensemble.get("min_weight", 0.0))
+
+def cmd_render(args):
+    import Prognosis_render as render
+    export_dir = args.export_dir or (None if args.slices else "Prognoses-Export")
+    tasks = render.chart_tasks(export_dir, args.output, args.format, args.slices or ())
+    files = render.render_all(tasks, args.workers)
+    print(f"\n{len(files)} charts have been saved to '{args.output}'")
+
+# ------------------------------------------------------------
+# Argument parser
+def build_parser():
+    profiling = argparse.ArgumentParser(add_help=False)
+    profiling.add_argument("--profile", action="store_true", help="print the time of every pipeline stage")
+    profiling.add_argument("--profile-cprofile", action="store_true", help="also record the function calls")
+    profiling.add_argument("--profile-memory", action="store_true", help="also record the peak memory")
+    profiling.add_argument("--profile-output", help="prefix of the profile summary and collapsed stack files")
+
+    common = argparse.ArgumentParser(add_help=False, parents=[profiling])
+    common.add_argument("--file", default="Prognosis-Datasource.xlsx", help="Excel file with the data")
+    common.add_argument("--sheet", default=0, help="sheet name or index")
+    common.add_argument("--cols", default="A, E", help="columns of years and values")
+    common.add_argument("--model", nargs="+", choices=gm.MODEL_NAMES, default=["logistic"])
+    common.add_argument("--preset-year", type=int, default=2026, help="year with the highest growth rate")
+    common.add_argument("--preset-year-max", type=int, default=2035, help="maximum of the preset year")
+    common.add_argument("--values-coeff-max", type=float, default=10, help="maximum coefficient for the values")
+    common.add_argument("--end-year", type=int, default=2050, help="end year of the prediction")
+    common.add_argument("--maxfev", type=int, default=10000)
+
+    # Loss and weights of the single series fits, the pooled fit does not support them
+    fitting = argparse.ArgumentParser(add_help=False, parents=[common])
+    fitting.add_argument("--loss", choices=gm.LOSSES, default="linear", help="robust loss of the fit")
+    fitting.add_argument("--f-scale", type=float, help="residual size where the robust loss starts")
+    fitting.add_argument("--recency-half-life", type=float, help="weight the recent years, in years")
+    fitting.add_argument("--irls", type=int, default=0, help="number of iteratively reweighted steps")
+
+    parser = argparse.ArgumentParser(description="Growth model prognoses")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("fit", parents=[fitting], help="fit the models and print the parameters")
+    p.add_argument("--plot", action="store_true")
+    p.set_defaults(func=cmd_fit)
+
+    p = sub.add_parser("predict", parents=[fitting], help="write the predictions to a CSV file")
+    p.add_argument("--output", default="Prognoses-Result.csv")
+    p.add_argument("--plot", action="store_true")
+    p.set_defaults(func=cmd_predict)
+
+    p = sub.add_parser("band", parents=[fitting], help="write the confidence band to a CSV file")
+    p.add_argument("--level", type=float, default=75, help="confidence level in percentage [0, 100]")
+    p.add_argument("--mode", choices=["z", "t"], default="t")
+    p.add_argument("--method", choices=["delta", "params"], default="delta",
+                   help="delta method through the model Jacobian or model at the parameter extremes")
+    p.add_argument("--prediction", action="store_true", help="prediction interval (adds the residual variance)")
+    p.add_argument("--output", default="Prognoses-Covariance.csv")
+    p.add_argument("--plot", action="store_true")
+    p.set_defaults(func=cmd_band)
+
+    p = sub.add_parser("sweep", parents=[fitting], help="fit over a grid of preset years and coefficients")
+    p.add_argument("--preset-years", help="range of preset years, e.g. 2020:2035")
+    p.add_argument("--coeffs", help="list of values_coeff_max, e.g. 3,5,10")
+    p.add_argument("--output", help="optional CSV file for the sweep table")
+    p.set_defaults(func=cmd_sweep)
+
+    p = sub.add_parser("export", parents=[fitting], help="write the predictions and growth rates")
+    p.add_argument("--output", default="Prognoses-Result.csv")
+    p.add_argument("--growth-output", default="growth_rates.csv")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("pool", parents=[common], help="fit related series jointly (logistic)")
+    p.add_argument("--year-col", default="A", help="column letter of the years")
+    p.add_argument("--series", nargs="+", required=True, help="column letters of the series")
+    p.add_argument("--total", help="column letter of the global series for the sum constraint")
+    p.add_argument("--growth-rate-sd", type=float, help="spread of the growth rates around the shared mean")
+    p.add_argument("--sum-weight", type=float, default=1.0, help="weight of the sum constraint")
+    p.add_argument("--output", default="Prognoses-Pooled.csv")
+    p.add_argument("--plot", action="store_true")
+    p.set_defaults(func=cmd_pool)
+
+    p = sub.add_parser("run", parents=[profiling], help="run all jobs of a TOML or YAML configuration file")
+    p.add_argument("--config", required=True)
+    p.add_argument("--workers", type=int, help="number of processes, 1 runs without a pool")
+    p.add_argument("--output", help="overrides the output of the configuration file")
+    p.add_argument("--export", help="directory of the precomputed dataset (see Prognosis_export)")
+    p.add_argument("--ensemble", help="CSV file of the ensemble per series (see Prognosis_ensemble)")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("render", parents=[profiling], help="render the charts of an export without refitting")
+    p.add_argument("--export-dir", help="directory written by run --export, default Prognoses-Export")
+    p.add_argument("--slices", nargs="+", help="JSON files with slices of GrowthCycleModel.to_slice")
+    p.add_argument("--output", default="Prognoses-Charts")
+    p.add_argument("--format", choices=["png", "svg"], default="png")
+    p.add_argument("--workers", type=int, help="number of processes, 1 renders without a pool")
+    p.set_defaults(func=cmd_render)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if isinstance(getattr(args, "sheet", None), str) and args.sheet.isdigit():
+        args.sheet = int(args.sheet)
+    profiling = args.profile or args.profile_cprofile or args.profile_memory or args.profile_output
+    if not profiling:
+        args.func(args)
+        return
+    stage_profiler = profile.enable(args.profile_cprofile, args.profile_memory)
+    try:
+        args.func(args)
+    finally:
+        profile.disable()
+        print(f"\n{stage_profiler.summary()}")
+        if args.profile_output:
+            stage_profiler.write(args.profile_output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Date: 19.10.2026
+Description: This module combines the fitted and manual curves of a series (e.g. the auto fit as
+worst case and the manual parameters as best case of Logistic_auto_manual_4) into one ensemble
+forecast. The weights of the members are constrained to be non-negative and to sum up to one per
+series, so the ensemble always stays inside the envelope of its members. They are either fixed,
+equal or derived from the back-test error of every member (see Prognosis_batch, backtest_years).
+Mean, spread and quantiles are computed on one (series, member, year) array for all series at once.
+Example:
+    python Prognosis_cli.py run --config prognosis_jobs.example.toml --ensemble Prognoses-Ensemble.csv
+Author: Kaiyu Qian
+"""
+import numpy as np
+import Prognosis_profile as profile
+
+WEIGHTINGS = ["equal", "fixed", "backtest"]
+
+# ------------------------------------------------------------
+# Weights
+def constrain_weights(weights, min_weight=0.0):
+    """
+    Project raw weights onto the allowed set: non-negative, at least min_weight for every valid
+    member and summing up to one. NaN marks a missing member and gets the weight 0, a series
+    without any positive weight falls back to equal weights of its valid members.
+    Parameters:
+        weights: array_like (S, M)
+        min_weight: float, lower bound of the weight of every valid member
+    Return:
+        array (S, M)
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    valid = np.isfinite(weights)
+    weights = np.where(valid, np.clip(weights, 0.0, None), 0.0)
+    total = weights.sum(axis=1, keepdims=True)
+    weights = np.where(total > 0, weights, valid)
+    weights = weights / np.maximum(weights.sum(axis=1, keepdims=True), 1e-300)
+    if min_weight > 0:
+        # The floor takes n_valid * floor from the budget, the rest keeps the proportions
+        n_valid = valid.sum(axis=1, keepdims=True)
+        floor = np.minimum(min_weight, 1.0 / np.maximum(n_valid, 1))
+        weights = np.where(valid, floor + (1 - n_valid * floor) * weights, 0.0)
+    return weights
+
+def backtest_weights(errors, power=2.0, min_weight=0.0):
+    """
+    Inverse error weights, w_i ~ 1 / error_i**power
+    Parameters:
+        errors: array_like (S, M), back-test RMSE of every member, NaN if unknown
+        power: float, 2 weights by the inverse mean squared error
+        min_weight: float
+    Return:
+        array (S, M)
+    """
+    errors = np.atleast_2d(np.asarray(errors, dtype=float))
+    with np.errstate(divide="ignore"):
+        raw = 1.0 / np.maximum(errors, 1e-12)**power
+    return constrain_weights(raw, min_weight)
+
+def fixed_weights(labels, weights):
+    """
+    Look up the fixed weight of every member by its label "model/scenario", its scenario or its
+    model, in this order; members without an entry get the weight 0
+    Parameters:
+        labels: list (S) of list (M) of (model, scenario), None for a missing member
+        weights: dict
+    Return:
+        array (S, M), not yet constrained
+    """
+    raw = np.full((len(labels), max(len(row) for row in labels)), np.nan)
+    for s, row in enumerate(labels):
+        for m, member in enumerate(row):
+            if member is None:
+                continue
+            model, scenario = member
+            raw[s, m] = weights.get(f"{model}/{scenario}", weights.get(scenario, weights.get(model, 0.0)))
+    return raw
+
+# ------------------------------------------------------------
+# Combination
+def weighted_quantiles(values, weights, quantiles):
+    """
+    Weighted quantiles over the member axis, NaN members are ignored. Equal weights give the
+    linear interpolation of np.percentile. The smallest and the largest member always stay the
+    0 and 1 quantile, the weights only move the plotting positions of the inner members, so the
+    quantiles of an ensemble of two members (e.g. auto and manual) do not depend on the weights,
+    only the weighted mean does
+    Parameters:
+        values: array (S, M, N)
+        weights: array (S, M, N), summing up to one over M
+        quantiles: array_like (Q) in [0, 1]
+    Return:
+        array (S, Q, N)
+    """
+    quantiles = np.asarray(quantiles, dtype=float)
+    # Members without weight must not be interpolated towards, they are dropped like NaN
+    values = np.where(np.nan_to_num(weights) > 0, values, np.nan)
+    order = np.argsort(values, axis=1) # NaN is sorted to the end
+    sorted_values = np.take_along_axis(values, order, axis=1)
+    sorted_weights = np.take_along_axis(np.where(np.isnan(values), 0.0, weights), order, axis=1)
+    # The trailing NaN members carry no weight, they repeat the largest valid value
+    sorted_values = np.where(np.isnan(sorted_values), np.fmax.reduce(values, axis=1, keepdims=True),
+                             sorted_values)
+    # Plotting positions (M_k - M_1) / (M_n - M_1) of the weight midpoints M_k = S_k - w_k / 2 of
+    # the cumulative weights S_k, symmetric in all weights and running from 0 for the smallest to
+    # 1 for the largest member, for equal weights (k - 1) / (n - 1) as in np.percentile
+    midpoints = np.cumsum(sorted_weights, axis=1) - sorted_weights / 2
+    last = np.maximum((~np.isnan(values)).sum(axis=1, keepdims=True) - 1, 0)
+    first = midpoints[:, :1]
+    span = np.take_along_axis(midpoints, last, axis=1) - first
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cdf = np.where(span > 0, (midpoints - first) / span, 0.0)
+    n_members = values.shape[1]
+    result = np.empty((values.shape[0], len(quantiles), values.shape[2]))
+    for i, q in enumerate(quantiles):
+        upper = np.clip((cdf < q).sum(axis=1, keepdims=True), 1, n_members - 1) if n_members > 1 \
+            else np.zeros((values.shape[0], 1, values.shape[2]), dtype=int)
+        lower = np.maximum(upper - 1, 0)
+        c0, c1 = np.take_along_axis(cdf, lower, axis=1), np.take_along_axis(cdf, upper, axis=1)
+        v0, v1 = np.take_along_axis(sorted_values, lower, axis=1), np.take_along_axis(sorted_values, upper, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.where(c1 > c0, (q - c0) / (c1 - c0), 0.0), 0.0, 1.0)
+        result[:, i, :] = (v0 + t * (v1 - v0))[:, 0, :]
+    return result
+
+def combine(predictions, weights, quantiles=(0.1, 0.5, 0.9)):
+    """
+    Ensemble of the member predictions of many series
+    Parameters:
+        predictions: array_like (S, M, N), NaN where a member has no value for a year
+        weights: array_like (S, M) or (M,), constrained weights of the members
+        quantiles: array_like (Q)
+    Return:
+        dict with "mean" (S, N), "spread" (S, N) the weighted standard deviation of the
+        members, "quantiles" (S, Q, N) and "members" (S, N) the number of members per year
+    """
+    predictions = np.asarray(predictions, dtype=float)
+    weights = np.broadcast_to(np.asarray(weights, dtype=float)[..., None] if np.ndim(weights) == 2
+                              else np.asarray(weights, dtype=float)[None, :, None], predictions.shape)
+    missing = np.isnan(predictions)
+    # Renormalise per year when a member does not reach a year
+    weights = np.where(missing, 0.0, weights)
+    total = weights.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weights = weights / total
+    filled = np.where(missing, 0.0, predictions)
+    mean = np.sum(weights * filled, axis=1)
+    spread = np.sqrt(np.sum(weights * (filled - mean[:, None, :])**2, axis=1))
+    return {
+        "mean": mean,
+        "spread": spread,
+        "quantiles": weighted_quantiles(predictions, weights, quantiles),
+        "members": (~missing).sum(axis=1),
+    }
+
+# ------------------------------------------------------------
+# Batch results
+def align_members(results):
+    """
+    Group the successful results of a batch run by series and put their predictions on one
+    common year axis
+    Parameters:
+        results: list of dict, result of Prognosis_batch.run_jobs
+    Return:
+        keys: list of (file, sheet, series)
+        labels: list of list of (model, scenario), None for the padding of smaller groups
+        years: 1-D array
+        predictions: array (S, M, N), NaN outside the years of a member
+        errors: array (S, M), back-test RMSE, NaN if unknown
+    """
+    groups = {}
+    for result in results:
+        if result["fit"] is not None:
+            job = result["job"]
+            groups.setdefault((job["file"], job["sheet"], job["series"]), []).append(result)
+    keys = list(groups)
+    if not keys:
+        return keys, [], np.array([], dtype=int), np.empty((0, 0, 0)), np.empty((0, 0))
+    first = min(int(r["future_years"][0]) for group in groups.values() for r in group)
+    last = max(int(r["future_years"][-1]) for group in groups.values() for r in group)
+    years = np.arange(first, last + 1)
+    n_members = max(len(group) for group in groups.values())
+    predictions = np.full((len(keys), n_members, len(years)), np.nan)
+    errors = np.full((len(keys), n_members), np.nan)
+    labels = []
+    for s, key in enumerate(keys):
+        row = []
+        for m, result in enumerate(groups[key]):
+            start = int(result["future_years"][0]) - first
+            predictions[s, m, start:start + len(result["future_years"])] = result["prediction"]
+            errors[s, m] = result.get("backtest_error", np.nan)
+            row.append((result["job"]["model"], result["job"]["scenario"]))
+        labels.append(row + [None] * (n_members - len(row)))
+    return keys, labels, years, predictions, errors
+
+def ensemble_weights(labels, errors, weighting="equal", weights=None, power=2.0, min_weight=0.0):
+    """
+    Parameters:
+        labels, errors: see align_members
+        weighting: "equal", "fixed" (weights by label, scenario or model) or "backtest"
+        weights: dict of the fixed weights
+    Return:
+        array (S, M)
+    """
+    present = np.array([[member is not None for member in row] for row in labels], dtype=bool)
+    if weighting == "fixed":
+        return constrain_weights(np.where(present, fixed_weights(labels, weights or {}), np.nan), min_weight)
+    if weighting == "backtest":
+        errors = np.where(present, errors, np.nan)
+        # Members without a back-test share the weight of an average member of their series
+        unknown = present & np.isnan(errors)
+        with np.errstate(all="ignore"):
+            fallback = np.nanmean(np.where(present, errors, np.nan), axis=1, keepdims=True)
+        errors = np.where(unknown, fallback, errors)
+        return backtest_weights(np.where(present, errors, np.nan), power, min_weight)
+    if weighting == "equal":
+        return constrain_weights(np.where(present, 1.0, np.nan), min_weight)
+    raise ValueError(f"Unknown weighting: {weighting}, use one of {WEIGHTINGS}")
+
+def ensemble_table(results, weighting="equal", weights=None, quantiles=(0.1, 0.5, 0.9), power=2.0,
+                   min_weight=0.0):
+    """
+    Ensemble forecast of every series of a batch run
+    Parameters:
+        results: list of dict, result of Prognosis_batch.run_jobs
+        weighting, weights, power, min_weight: see ensemble_weights
+        quantiles: array_like in [0, 1]
+    Return:
+        forecasts: DataFrame with the columns sheet, series, year, mean, spread, q<percent>...,
+                   members
+        member_weights: DataFrame with the columns sheet, series, model, scenario, weight,
+                        backtest_error
+    """
+    import pandas as pd
+    keys, labels, years, predictions, errors = align_members(results)
+    if not keys:
+        return pd.DataFrame(), pd.DataFrame()
+    member_weights = ensemble_weights(labels, errors, weighting, weights, power, min_weight)
+    ensemble = combine(predictions, member_weights, quantiles)
+    n_series, n_years = len(keys), len(years)
+    columns = {
+        "sheet": np.repeat([str(key[1]) for key in keys], n_years),
+        "series": np.repeat([key[2] for key in keys], n_years),
+        "year": np.tile(years, n_series),
+        "mean": ensemble["mean"].ravel(),
+        "spread": ensemble["spread"].ravel(),
+    }
+    for i, q in enumerate(quantiles):
+        columns[f"q{100 * q:g}"] = ensemble["quantiles"][:, i, :].ravel()
+    columns["members"] = ensemble["members"].ravel()
+    forecasts = pd.DataFrame(columns)
+    forecasts = forecasts[forecasts["members"] > 0].reset_index(drop=True)
+    rows = [{"sheet": str(key[1]), "series": key[2], "model": member[0], "scenario": member[1],
+             "weight": member_weights[s, m], "backtest_error": errors[s, m]}
+            for s, key in enumerate(keys) for m, member in enumerate(labels[s]) if member is not None]
+    return forecasts, pd.DataFrame(rows)
+
+def write_ensemble(results, output, weighting="equal", weights=None, quantiles=(0.1, 0.5, 0.9),
+                   power=2.0, min_weight=0.0):
+    """
+    Write the ensemble forecasts to a CSV file and the member weights to <output>-weights.csv
+    """
+    import os
+    with profile.stage("ensemble"):
+        forecasts, member_weights = ensemble_table(results, weighting, weights, quantiles, power, min_weight)
+        weights_output = f"{os.path.splitext(output)[0]}-weights.csv"
+        forecasts.to_csv(output, index=False)
+        member_weights.to_csv(weights_output, index=False)
+    print(f"\nEnsemble of {member_weights['series'].nunique() if len(member_weights) else 0} series "
+          f"has been saved to '{output}' and '{weights_output}'")
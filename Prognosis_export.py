@@ -0,0 +1,208 @@
+"""
+Date: 19.10.2026
+Description: This module writes the results of a batch run (see Prognosis_batch) as a precomputed
+dataset for the Power BI reports and the WordPress embedding:
+    - forecasts: one row per job/year with sheet, series, model, scenario, prediction, band and
+      growth rate, Parquet partitioned by sheet and model (CSV partitions if pyarrow is not installed)
+    - metrics: one row per job with parameters, R2 and growth metrics
+    - json: one small prebuilt slice per job and an index.json listing them
+The job name is part of every row and slice, two jobs may fit the same series, model and scenario
+with different settings.
+The dashboard reads these slices instead of rerunning the fits on every refresh.
+Author: Kaiyu Qian
+"""
+import json
+import os
+import re
+import numpy as np
+import Growth_models as gm
+import Prognosis_profile as profile
+
+def slug(text):
+    """File system friendly name, e.g. 'Global Top5' -> 'Global_Top5'"""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(text)).strip("_") or "_"
+
+def _growth_rate(values):
+    """Year over year growth rate, NaN for the first year and for zero values"""
+    rate = np.full(len(values), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate[1:] = np.diff(values) / values[:-1]
+    rate[~np.isfinite(rate)] = np.nan
+    return rate
+
+def _aligned_band(result):
+    """return : lower, upper on the future years of the result, NaN before the band starts"""
+    lower = np.full(len(result["future_years"]), np.nan)
+    upper = np.full(len(result["future_years"]), np.nan)
+    start = len(result["future_years"]) - len(result["covariance_years"])
+    lower[start:] = result["lower"]
+    upper[start:] = result["upper"]
+    return lower, upper
+
+def forecast_table(results):
+    """
+    Parameters:
+        results: list of dict, result of Prognosis_batch.run_jobs
+    Return:
+        DataFrame with the columns job, sheet, series, model, scenario, year, value, lower, upper,
+        growth_rate, forecast (True after the last data year)
+    """
+    import pandas as pd
+    frames = []
+    for result in results:
+        if result["fit"] is None:
+            continue
+        job = result["job"]
+        lower, upper = _aligned_band(result)
+        frames.append(pd.DataFrame({
+            "job": job["name"],
+            "sheet": str(job["sheet"]),
+            "series": job["series"],
+            "model": job["model"],
+            "scenario": job["scenario"],
+            "year": result["future_years"].astype(np.int16),
+            "value": result["prediction"].astype(np.float32),
+            "lower": lower.astype(np.float32),
+            "upper": upper.astype(np.float32),
+            "growth_rate": _growth_rate(result["prediction"]).astype(np.float32),
+            "forecast": result["future_years"] > np.max(result["years"]),
+        }))
+    if not frames:
+        return pd.DataFrame()
+    table = pd.concat(frames, ignore_index=True)
+    for column in ("job", "sheet", "series", "model", "scenario"):
+        table[column] = table[column].astype("category")
+    return table
+
+def metrics_table(results):
+    """
+    Parameters:
+        results: list of dict, result of Prognosis_batch.run_jobs
+    Return:
+        DataFrame, one row per successful result with the parameters, R2, the year of the
+        largest yearly increase (inflection) and the CAGR from the last data year to the end year
+    """
+    import pandas as pd
+    rows = []
+    for result in results:
+        if result["fit"] is None:
+            continue
+        job = result["job"]
+        years, prediction = result["future_years"], result["prediction"]
+        increase = np.diff(prediction)
+        last_year = int(np.max(result["years"]))
+        start = int(np.searchsorted(years, last_year))
+        span = years[-1] - last_year
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cagr = (prediction[-1] / prediction[start])**(1 / span) - 1 if span > 0 else np.nan
+        row = {
+            "job": job["name"],
+            "sheet": str(job["sheet"]),
+            "series": job["series"],
+            "model": job["model"],
+            "scenario": job["scenario"],
+            "r2": result["r2"],
+            "last_year": last_year,
+            "end_year": int(years[-1]),
+            "end_value": prediction[-1],
+            "peak_increase_year": int(years[1:][np.nanargmax(increase)]) if np.any(np.isfinite(increase)) else None,
+            "cagr": cagr,
+        }
+        for name, value in zip(gm.MODEL_PARAMS[job["model"]], result["fit"]["params"]):
+            row[f"param_{name}"] = value
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def _json_list(values, digits=6):
+    """Rounded list with None for NaN, keeps the JSON slices small"""
+    return [None if not np.isfinite(v) else float(f"{v:.{digits}g}") for v in values]
+
+def write_json_slices(results, out_dir):
+    """
+    Write one JSON file per job, json/<sheet>/<series>/<job>.json, and an index.json
+    Parameters:
+        results: list of dict, result of Prognosis_batch.run_jobs
+        out_dir: str
+    Return:
+        list of dict, the entries of the index
+    """
+    index, paths = [], {}
+    for result in results:
+        if result["fit"] is None:
+            continue
+        job = result["job"]
+        path = os.path.join("json", slug(job["sheet"]), slug(job["series"]), f"{slug(job['name'])}.json")
+        if path in paths:
+            raise ValueError(f"Job names {paths[path]!r} and {job['name']!r} give the same slice {path}")
+        paths[path] = job["name"]
+        lower, upper = _aligned_band(result)
+        payload = {
+            "job": job["name"],
+            "sheet": str(job["sheet"]),
+            "series": job["series"],
+            "model": job["model"],
+            "scenario": job["scenario"],
+            "params": dict(zip(gm.MODEL_PARAMS[job["model"]], _json_list(result["fit"]["params"]))),
+            "r2": _json_list([result["r2"]])[0],
+            "inflection_year": gm.inflection_year(result["fit"]),
+            "data": {"years": [int(y) for y in result["years"]], "values": _json_list(result["values"])},
+            "years": [int(y) for y in result["future_years"]],
+            "value": _json_list(result["prediction"]),
+            "lower": _json_list(lower),
+            "upper": _json_list(upper),
+            "growth_rate": _json_list(_growth_rate(result["prediction"])),
+        }
+        full_path = os.path.join(out_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        index.append({key: payload[key] for key in ("job", "sheet", "series", "model", "scenario", "r2")})
+        index[-1]["path"] = path.replace(os.sep, "/")
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    return index
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def write_dataset(results, out_dir):
+    """
+    Write the forecasts, metrics and JSON slices of a batch run
+    Parameters:
+        results: list of dict, result of Prognosis_batch.run_jobs
+        out_dir: str
+    """
+    with profile.stage("export"):
+        index = _write_dataset(results, out_dir)
+    if index is not None:
+        print(f"\n{len(index)} forecasts have been exported to '{out_dir}'")
+
+def _write_dataset(results, out_dir):
+    """return : the slice index, None if there is nothing to export"""
+    import shutil
+    forecasts = forecast_table(results)
+    metrics = metrics_table(results)
+    if forecasts.empty:
+        print("No successful fit, nothing to export")
+        return None
+    os.makedirs(out_dir, exist_ok=True)
+    forecast_dir = os.path.join(out_dir, "forecasts")
+    # The partitions are rewritten completely, stale series must not survive a refresh
+    shutil.rmtree(forecast_dir, ignore_errors=True)
+    if _has_pyarrow():
+        forecasts.to_parquet(forecast_dir, partition_cols=["sheet", "model"], index=False)
+        metrics.to_parquet(os.path.join(out_dir, "metrics.parquet"), index=False)
+    else:
+        print("pyarrow is not installed, the dataset is written as partitioned CSV files")
+        for (sheet, model), part in forecasts.groupby(["sheet", "model"], observed=True):
+            # Same partition values as the Parquet writer, Excel sheet names are valid file names
+            part_dir = os.path.join(forecast_dir, f"sheet={sheet}", f"model={model}")
+            os.makedirs(part_dir, exist_ok=True)
+            part.drop(columns=["sheet", "model"]).to_csv(os.path.join(part_dir, "part-0.csv"), index=False)
+        metrics.to_csv(os.path.join(out_dir, "metrics.csv"), index=False)
+    shutil.rmtree(os.path.join(out_dir, "json"), ignore_errors=True)
+    return write_json_slices(results, out_dir)
@@ -5,9 +5,7 @@ Description: This module contains a class for the mixed model of growth and cycl
 Author: Kaiyu Qian
 """
 import numpy as np
-from scipy.optimize import curve_fit
-import matplotlib.pyplot as plt
-from sklearn.metrics import r2_score
+from Growth_models import r2_score, robust_curve_fit
 
 class GrowthCycleModel:
 
@@ -39,14 +37,17 @@ class GrowthCycleModel:
         
         return growth + cycle
     
-    def fit(self, t_data, y_data, p0=None):
+    def fit(self, t_data, y_data, p0=None, loss="linear", f_scale=None, weights=None, irls_iterations=0):
         """
         Fit the mixed growth-cycle model to the data
         Parameters:
         t_data: Time points
         y_data: Values
         p0: Initial parameters
-        fixed_params: Fixed parameters
+        loss: "linear", "soft_l1", "huber", "cauchy" or "arctan"
+        f_scale: Residual size where the robust loss starts, None estimates it
+        weights: Weight of every point, e.g. Growth_models.recency_weights
+        irls_iterations: Number of iteratively reweighted steps, 0 uses the robust loss directly
         """
         if p0 is None:
             # Use some default values for initial parameters
@@ -60,12 +61,13 @@ class GrowthCycleModel:
             p0 = [L, k, t0, A, T, phi, w]
         
         # Fit the model to the data
-        self.params, self.covariance = curve_fit(
+        self.params, self.covariance = robust_curve_fit(
             self.model_function, t_data, y_data,
             p0=p0,
             bounds=([0, 0, min(t_data), 0, 0, -np.pi, 0],
                     [np.inf, np.inf, max(t_data) + 15, 1, np.inf, np.pi, np.inf]),
-            maxfev=10000
+            maxfev=10000,
+            loss=loss, f_scale=f_scale, weights=weights, irls_iterations=irls_iterations
         )
         
         return self
@@ -93,6 +95,40 @@ class GrowthCycleModel:
             raise ValueError("The model has not been fitted yet")
         return self.model_function(t, *self.params)
     
+    def to_slice(self, t_data, y_data, t_future, name="Mixed model", sheet=""):
+        """
+        The fit and prediction as a chart slice for Prognosis_render, in the same format as
+        the JSON slices of Prognosis_export plus the growth component and cycle envelope
+        Parameters:
+        t_data: Time points
+        y_data: Values
+        t_future: Last year of the prediction
+        name: Name of the series
+        sheet: Sheet of the series, the slice joins the chart of the same sheet and series
+        """
+        if self.params is None:
+            raise ValueError("The model has not been fitted yet")
+        years = np.arange(min(t_data), t_future + 1)
+        growth = self.params[0] / (1 + np.exp(-self.params[1] * (years - self.params[2])))
+        amplitude_factor = (growth / self.params[0]) ** self.params[6]
+        return {
+            "sheet": str(sheet),
+            "series": name,
+            "model": "growth_cycle",
+            "scenario": "auto",
+            "params": dict(zip(['L', 'k', 't0', 'A', 'T', 'phi', 'w'], [float(p) for p in self.params])),
+            "r2": float(r2_score(y_data, self.predict(t_data))),
+            "inflection_year": float(self.params[2]),
+            "data": {"years": [int(t) for t in t_data], "values": [float(y) for y in y_data]},
+            "years": [int(t) for t in years],
+            "value": [float(y) for y in self.predict(years)],
+            "components": {
+                "trend": [float(y) for y in growth],
+                "envelope_lower": [float(y) for y in growth - self.params[3] * amplitude_factor],
+                "envelope_upper": [float(y) for y in growth + self.params[3] * amplitude_factor],
+            },
+        }
+
     def plot_fit_and_prediction(self, t_data, y_data, t_future=None, show_components=True):
         """
         Plot the fitting and prediction results
@@ -100,6 +136,7 @@ class GrowthCycleModel:
         t_future: Time points for future prediction
         show_components: Whether to show the growth and cycle components
         """
+        import matplotlib.pyplot as plt
         if t_future is None:
             t_future = np.linspace(min(t_data), max(t_data) + 10, 1000)
         else:
@@ -145,13 +182,14 @@ class GrowthCycleModel:
         plt.show()
         
 if __name__ == "__main__":
-    import pandas as pd
-    data = pd.read_excel(r"Prognosis-Datasource.xlsx", header=0, usecols="A, B")
-    data.dropna( inplace=True)
-    years = np.array(data.iloc[:,0].astype(int).tolist())
-    values = np.array(data.iloc[:,1].astype(float).tolist())
+    import json
+    from Growth_models import load_series
+    years, values, value_label = load_series(r"Prognosis-Datasource.xlsx", "A, B")
     
     model = GrowthCycleModel()
     model.fit(years, values)
     model.adjust_parameters(T=15,L=1100, A=0.6, w=3)
+    # Chart slice for the batch renderer: python Prognosis_cli.py render --slices Prognoses-Mix.json
+    with open("Prognoses-Mix.json", "w", encoding="utf-8") as f:
+        json.dump(model.to_slice(years, values, 2050, value_label, sheet=0), f)
     model.plot_fit_and_prediction(years, values, t_future=2050)
\ No newline at end of file
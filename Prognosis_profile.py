@@ -0,0 +1,348 @@
+"""
+Date: 19.10.2026
+Description: Profiling of the prognosis pipeline. The stages load, fit, band, export and plot are
+wrapped with stage(name), which costs nothing while profiling is disabled. When it is enabled,
+every stage is timed and optionally profiled with cProfile and tracemalloc, the records of the
+pool workers are merged into the parent process. The result is a per-stage summary and a
+collapsed stack file that flamegraph.pl or speedscope can read.
+The classic scripts can be profiled without changes, their time is attributed to the stages by
+the functions they call (read_excel, curve_fit, Confidence_intervals, to_excel, matplotlib):
+    python Prognosis_profile.py Logistic_auto_manual_4.py --memory --output profile
+Author: Kaiyu Qian
+"""
+import contextlib
+import os
+import time
+
+STAGES = ["load", "fit", "band", "ensemble", "export", "plot"]
+
+# The profiler of this process, None while profiling is disabled
+_active = None
+
+class StageProfiler:
+
+    def __init__(self, cprofile=False, memory=False):
+        """
+        Parameters:
+        cprofile: Whether to record the function calls of every stage with cProfile
+        memory: Whether to record the peak memory of every stage with tracemalloc
+        """
+        self.cprofile = cprofile
+        self.memory = memory
+        self.records = {}
+        self.stats = {}
+        self.peak_memory = None
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Time one stage, nested stages are also counted in the outer stage, cProfile and
+        tracemalloc only run for the outermost stage
+        """
+        outer = self._depth == 0
+        self._depth += 1
+        profiler = None
+        started_tracing = False
+        if outer and self.memory:
+            import tracemalloc
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if outer and self.cprofile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._depth -= 1
+            peak = None
+            if profiler is not None:
+                profiler.disable()
+                profiler.create_stats()
+                self.stats[name] = merge_stats(self.stats.get(name, {}), profiler.stats)
+            if outer and self.memory:
+                import tracemalloc
+                peak = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            self._add_record(name, 1, elapsed, elapsed, peak)
+
+    def _add_record(self, name, calls, total, longest, peak):
+        """longest is None for records aggregated from a profile, their longest call is unknown"""
+        record = self.records.setdefault(name, {"calls": 0, "total": 0.0, "max": None, "peak_memory": None})
+        record["calls"] += calls
+        record["total"] += total
+        if longest is not None:
+            record["max"] = max(record["max"] or 0.0, longest)
+        if peak is not None:
+            record["peak_memory"] = max(record["peak_memory"] or 0, peak)
+
+    def merge(self, data):
+        """
+        Add the records of another profiler, e.g. of a pool worker
+        Parameters:
+        data: (records, stats), result of drain
+        """
+        if data is None:
+            return
+        records, stats = data
+        for name, record in records.items():
+            self._add_record(name, record["calls"], record["total"], record["max"], record["peak_memory"])
+        for name, stage_stats in stats.items():
+            self.stats[name] = merge_stats(self.stats.get(name, {}), stage_stats)
+
+    def drain(self):
+        """ Return (records, stats) and start again with empty records """
+        data = (self.records, self.stats)
+        self.records, self.stats = {}, {}
+        return data
+
+    def summary(self):
+        """ Per-stage table of calls, total, mean and max time and peak memory """
+        total = sum(self.records[name]["total"] for name in self.records) or 1.0
+        lines = [f"{'Stage':<12}{'Calls':>8}{'Total [s]':>12}{'Share':>8}{'Mean [ms]':>12}"
+                 f"{'Max [ms]':>12}{'Peak [MB]':>12}"]
+        order = [name for name in STAGES if name in self.records] + \
+            sorted(name for name in self.records if name not in STAGES)
+        for name in order:
+            record = self.records[name]
+            peak = f"{record['peak_memory'] / 2**20:.1f}" if record["peak_memory"] is not None else "-"
+            longest = f"{1000 * record['max']:.2f}" if record["max"] is not None else "-"
+            lines.append(f"{name:<12}{record['calls']:>8}{record['total']:>12.3f}"
+                         f"{record['total'] / total:>8.1%}{1000 * record['total'] / record['calls']:>12.2f}"
+                         f"{longest:>12}{peak:>12}")
+        if self.peak_memory is not None:
+            lines.append(f"Peak memory of the whole run: {self.peak_memory / 2**20:.1f} MB")
+        return "\n".join(lines)
+
+    def write(self, prefix):
+        """
+        Write <prefix>-summary.txt and <prefix>.folded (collapsed stacks, one line per stack
+        with the self time in microseconds)
+        """
+        with open(f"{prefix}-summary.txt", "w", encoding="utf-8") as f:
+            f.write(self.summary() + "\n")
+        with open(f"{prefix}.folded", "w", encoding="utf-8") as f:
+            # Without cProfile the stacks are only the stages themselves
+            if self.stats:
+                for name, stage_stats in self.stats.items():
+                    for stack, value in collapsed_stacks(stage_stats, name):
+                        f.write(f"{stack} {value}\n")
+            else:
+                for name, record in self.records.items():
+                    f.write(f"{name} {int(record['total'] * 1e6)}\n")
+        print(f"\nProfile has been saved to '{prefix}-summary.txt' and '{prefix}.folded'")
+
+# ------------------------------------------------------------
+# cProfile helpers
+def merge_stats(a, b):
+    """
+    Add two raw cProfile stats dicts {func: (cc, nc, tt, ct, callers)}
+    Return:
+        dict
+    """
+    merged = dict(a)
+    for func, (cc, nc, tt, ct, callers) in b.items():
+        if func not in merged:
+            merged[func] = (cc, nc, tt, ct, dict(callers))
+            continue
+        cc0, nc0, tt0, ct0, callers0 = merged[func]
+        callers0 = dict(callers0)
+        for caller, edge in callers.items():
+            old = callers0.get(caller)
+            callers0[caller] = edge if old is None else tuple(x + y for x, y in zip(old, edge))
+        merged[func] = (cc0 + cc, nc0 + nc, tt0 + tt, ct0 + ct, callers0)
+    return merged
+
+def _label(func):
+    filename, line, name = func
+    label = name if filename == "~" else f"{name} ({os.path.basename(filename)}:{line})"
+    return label.replace(";", ",")
+
+def collapsed_stacks(stats, root, max_depth=40):
+    """
+    Rebuild call stacks from cProfile caller edges, every function is placed below its most
+    expensive caller and carries its own time, so the stacks add up to the profiled time
+    Parameters:
+        stats: raw cProfile stats dict
+        root: str, name of the root frame (the stage)
+    Return:
+        list of (stack, microseconds)
+    """
+    def best_caller(func):
+        callers = stats[func][4]
+        candidates = [c for c in callers if c in stats]
+        return max(candidates, key=lambda c: callers[c][3]) if candidates else None
+
+    stacks = []
+    for func, (_, _, tt, _, _) in stats.items():
+        value = int(tt * 1e6)
+        if value <= 0:
+            continue
+        path, seen, current = [], set(), func
+        while current is not None and current not in seen and len(path) < max_depth:
+            path.append(_label(current))
+            seen.add(current)
+            current = best_caller(current)
+        stacks.append((";".join([root] + path[::-1]), value))
+    return stacks
+
+# ------------------------------------------------------------
+# Module level switch used by the pipeline
+def enable(cprofile=False, memory=False):
+    """ Enable profiling in this process, return : StageProfiler """
+    global _active
+    _active = StageProfiler(cprofile, memory)
+    return _active
+
+def disable():
+    global _active
+    _active = None
+
+def active():
+    """ return : StageProfiler or None """
+    return _active
+
+def stage(name):
+    """ Context manager of a pipeline stage, does nothing while profiling is disabled """
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
+
+def worker_options():
+    """ return : the initargs of init_worker for a pool, None while profiling is disabled """
+    return None if _active is None else (_active.cprofile, _active.memory)
+
+def init_worker(options):
+    """ Pool initializer that enables profiling in the worker with the options of the parent """
+    if options is not None:
+        enable(*options)
+
+def drain():
+    """ return : the records of this process since the last drain, None while disabled """
+    return None if _active is None else _active.drain()
+
+def merge(data):
+    """ Add the drained records of a worker to the profiler of this process """
+    if _active is not None:
+        _active.merge(data)
+
+# ------------------------------------------------------------
+# Profiling of the classic scripts
+STAGE_MARKERS = {
+    "load": ["read_excel", "read_csv"],
+    "fit": ["curve_fit", "least_squares", "leastsq"],
+    "band": ["Confidence_intervals.py"],
+    "export": ["to_excel", "to_csv", "to_parquet", "write_dataset"],
+    "plot": ["matplotlib"],
+}
+
+def _stage_of(func):
+    filename, _, name = func
+    for stage_name, markers in STAGE_MARKERS.items():
+        if any(marker == name or marker in filename for marker in markers):
+            return stage_name
+    return None
+
+def attribute_stages(stats):
+    """
+    Split the cumulative time of a script profile into the stages by the functions it calls,
+    only the outermost calls of a stage are counted, i.e. the calls that are not made from
+    anywhere below another call of the same stage
+    Parameters:
+        stats: raw cProfile stats dict
+    Return:
+        dict stage -> (calls, seconds)
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+    marked = {}
+    for func in stats:
+        stage_name = _stage_of(func)
+        if stage_name is not None:
+            marked.setdefault(stage_name, []).append(func)
+    result = {}
+    for stage_name, funcs in marked.items():
+        # Everything that runs below a function of this stage, cProfile merges all calls of a
+        # function into one node, the search stops at module code, otherwise an import inside
+        # the stage would reach the script itself
+        inside, todo = set(funcs), list(funcs)
+        while todo:
+            for callee in callees.get(todo.pop(), []):
+                if callee not in inside and callee[2] != "<module>":
+                    inside.add(callee)
+                    todo.append(callee)
+        calls, seconds = 0, 0.0
+        for func in funcs:
+            callers = stats[func][4]
+            outer_calls = [edge for caller, edge in callers.items() if caller not in inside]
+            if callers and not outer_calls:
+                continue
+            # A function that is also called from inside its stage only counts its outer calls
+            if callers and len(outer_calls) < len(callers):
+                calls += sum(edge[1] for edge in outer_calls)
+                seconds += sum(edge[3] for edge in outer_calls)
+            else:
+                calls += stats[func][1]
+                seconds += stats[func][3]
+        if calls:
+            result[stage_name] = (calls, seconds)
+    return result
+
+def profile_script(path, memory=False):
+    """
+    Run a script as __main__ under cProfile with the Agg backend, so plt.show() does not block
+    Parameters:
+        path: str
+        memory: bool, record the peak memory with tracemalloc
+    Return:
+        StageProfiler with one record per stage, the rest of the run is "other"
+    """
+    import cProfile
+    import runpy
+    import sys
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    if memory:
+        import tracemalloc
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        runpy.run_path(path, run_name="__main__")
+    finally:
+        profiler.disable()
+    elapsed = time.perf_counter() - start
+    profiler.create_stats()
+    result = StageProfiler(cprofile=True, memory=memory)
+    if memory:
+        import tracemalloc
+        result.peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    staged = 0.0
+    for stage_name, (calls, seconds) in attribute_stages(profiler.stats).items():
+        result._add_record(stage_name, calls, seconds, None, None)
+        staged += seconds
+    result._add_record("other", 1, max(elapsed - staged, 0.0), max(elapsed - staged, 0.0), None)
+    result.stats[os.path.basename(path)] = profiler.stats
+    return result
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Profile a prognosis script by pipeline stage")
+    parser.add_argument("script")
+    parser.add_argument("--memory", action="store_true", help="record the peak memory with tracemalloc")
+    parser.add_argument("--output", help="prefix of the summary and collapsed stack files")
+    args = parser.parse_args()
+    script_profile = profile_script(args.script, args.memory)
+    print(script_profile.summary())
+    if args.output:
+        script_profile.write(args.output)
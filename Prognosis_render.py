@@ -0,0 +1,162 @@
+"""
+Date: 19.10.2026
+Description: Headless batch rendering of the forecast charts. The charts are drawn from the stored
+results of Prognosis_export (index.json and the JSON slices), nothing is refitted. One chart per
+sheet and series shows the data, every model/scenario curve, the confidence bands, the inflection
+year and, if present, the component envelopes of the mixed model. Slices written with
+GrowthCycleModel.to_slice (Prognosis_mix) are added with --slices, they join the chart of their
+sheet and series. The charts are rendered on a process pool with the non-interactive Agg backend,
+every worker reuses one figure template.
+Example:
+    python Prognosis_cli.py render --export-dir Prognoses-Export --output charts --format svg
+    python Prognosis_cli.py render --export-dir Prognoses-Export --slices Prognoses-Mix.json
+Author: Kaiyu Qian
+"""
+import json
+import os
+import Prognosis_profile as profile
+from Prognosis_export import slug
+
+MODEL_COLORS = {
+    "logistic": "blue",
+    "gompertz": "green",
+    "gaussian": "purple",
+    "exponential": "magenta",
+    "power_law": "orange",
+    "growth_cycle": "red",
+}
+SCENARIO_STYLES = ["--", "-.", ":", (0, (5, 1))]
+
+# The figure template of the worker process, created once by _init_worker
+_figure = None
+
+def _init_worker(figsize=(10, 6), dpi=100):
+    """Create the figure template of this process on the Agg canvas, pyplot is not used"""
+    global _figure
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    _figure = Figure(figsize=figsize, dpi=dpi, layout="tight")
+    FigureCanvasAgg(_figure)
+    _figure.add_subplot(111)
+
+def _none_to_nan(values):
+    return [float("nan") if v is None else v for v in values]
+
+def draw_chart(ax, slices, title):
+    """
+    Draw the slices of one series into an axes
+    Parameters:
+        ax: matplotlib Axes
+        slices: list of dict, JSON slices of Prognosis_export or GrowthCycleModel.to_slice
+        title: str
+    """
+    data = slices[0]["data"]
+    ax.scatter(data["years"], _none_to_nan(data["values"]), color="black", label="Original Data", zorder=3)
+    scenarios = {}
+    members = [(chart_slice["model"], chart_slice["scenario"]) for chart_slice in slices]
+    for chart_slice in slices:
+        model, scenario = chart_slice["model"], chart_slice["scenario"]
+        color = MODEL_COLORS.get(model, "gray")
+        style = SCENARIO_STYLES[scenarios.setdefault(scenario, len(scenarios)) % len(SCENARIO_STYLES)]
+        label = f"{model} ({scenario})"
+        if members.count((model, scenario)) > 1 and chart_slice.get("job"):
+            # Several jobs with the same model and scenario, e.g. a plain and a robust fit
+            label = f"{label} {chart_slice['job']}"
+            style = SCENARIO_STYLES[slices.index(chart_slice) % len(SCENARIO_STYLES)]
+        years = chart_slice["years"]
+        ax.plot(years, _none_to_nan(chart_slice["value"]), linestyle=style, color=color, label=label)
+        if "lower" in chart_slice:
+            ax.fill_between(years, _none_to_nan(chart_slice["lower"]), _none_to_nan(chart_slice["upper"]),
+                            color=color, alpha=0.2)
+        if chart_slice.get("inflection_year") is not None:
+            ax.axvline(x=chart_slice["inflection_year"], linestyle="-", color=color, linewidth=0.8,
+                       label=f"Preset year {int(chart_slice['inflection_year'])}")
+        components = chart_slice.get("components")
+        if components:
+            ax.plot(years, components["trend"], linestyle="--", color="green", label="Trend component")
+            ax.fill_between(years, components["envelope_lower"], components["envelope_upper"],
+                            alpha=0.2, color="gray", label="Periodic cycle")
+    ax.set_title(title)
+    ax.grid(True)
+    ax.legend(fontsize="small")
+
+def render_task(task):
+    """
+    Render one chart with the figure template of this worker
+    Parameters:
+        task: (slices, title, output_path)
+    Return:
+        str, output_path
+    """
+    if _figure is None:
+        _init_worker()
+    slices, title, output_path = task
+    with profile.stage("plot"):
+        ax = _figure.axes[0]
+        ax.clear()
+        draw_chart(ax, slices, title)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        _figure.savefig(output_path)
+    return output_path
+
+def _init_pool_worker(profile_options):
+    profile.init_worker(profile_options)
+    _init_worker()
+
+def _render_task_profiled(task):
+    """render_task in a pool worker, return : (output_path, profile records of the worker)"""
+    return render_task(task), profile.drain()
+
+def load_slices(path):
+    """return : list of slices of a JSON file with one slice or a list of slices (to_slice output)"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    return content if isinstance(content, list) else [content]
+
+def chart_tasks(export_dir, output_dir, fmt="png", slice_files=()):
+    """
+    Group the JSON slices of an export and of extra slice files by sheet and series
+    Parameters:
+        export_dir: str, directory written by Prognosis_export.write_dataset, None for only
+                    the slice files
+        output_dir: str
+        fmt: str, "png" or "svg"
+        slice_files: list of str, JSON files with slices of GrowthCycleModel.to_slice
+    Return:
+        list of (slices, title, output_path)
+    """
+    groups = {}
+    if export_dir is not None:
+        with open(os.path.join(export_dir, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        for entry in index:
+            with open(os.path.join(export_dir, entry["path"]), "r", encoding="utf-8") as f:
+                groups.setdefault((entry["sheet"], entry["series"]), []).append(json.load(f))
+    for path in slice_files:
+        for chart_slice in load_slices(path):
+            groups.setdefault((str(chart_slice["sheet"]), chart_slice["series"]), []).append(chart_slice)
+    return [(slices, f"{series} ({sheet}) up to {slices[0]['years'][-1]}",
+             os.path.join(output_dir, slug(sheet), f"{slug(series)}.{fmt}"))
+            for (sheet, series), slices in groups.items()]
+
+def render_all(tasks, workers=None):
+    """
+    Render the charts on a process pool
+    Parameters:
+        tasks: list of (slices, title, output_path), see chart_tasks
+        workers: int, number of processes, 1 renders in this process
+    Return:
+        list of str, the written files
+    """
+    if workers == 1 or len(tasks) <= 1:
+        return [render_task(task) for task in tasks]
+    from concurrent.futures import ProcessPoolExecutor
+    # Larger chunks keep the pickling overhead small for hundreds of charts
+    chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))
+    files = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_worker,
+                             initargs=(profile.worker_options(),)) as pool:
+        for output_path, records in pool.map(_render_task_profiled, tasks, chunksize=chunksize):
+            profile.merge(records)
+            files.append(output_path)
+    return files
@@ -4,7 +4,6 @@ Description: Show the trend of Periode.
 Author: Kaiyu Qian
 """
 import pandas as pd
-from matplotlib import pyplot as plt
 from statsmodels.tsa.seasonal import seasonal_decompose
 file_path = r"Prognosis-Datasource.xlsx"
 data = pd.read_excel(
@@ -14,5 +13,9 @@ data.columns = ["Years", "Values"]
 data.dropna(subset=["Years", "Values"], inplace=True)
 data.set_index("Years", inplace=True)
 data.astype(float)
-seasonal_decompose(data, model='additive', period=10).plot()
-plt.show()
+result = seasonal_decompose(data, model='additive', period=10)
+
+if __name__ == "__main__":
+    from matplotlib import pyplot as plt
+    result.plot()
+    plt.show()
@@ -0,0 +1,187 @@
+"""
+Date: 19.10.2026
+Description: Array backed container for the series of a sheet. All series share one aligned year
+axis, the values are one 2-D array (n_series, n_years) and a validity mask marks the observed
+years of every series, so ragged histories need no dropna copies and no list conversions.
+Fits, the seasonal decomposition and the blended forecasts read the valid observations of a
+series directly from the arrays:
+    panel = SeriesPanel.from_excel("Installation.xlsx", "A", ["B", "C", "I"], "Global Top5")
+    years, values = panel.series("I")
+    fits = Growth_models.fit_panel("logistic", panel, 2026, 2035)
+Author: Kaiyu Qian
+"""
+import numpy as np
+import Prognosis_profile as profile
+from Growth_models import column_index
+
+class SeriesPanel:
+
+    def __init__(self, years, values, names=None, mask=None, keys=None, year_name="Year"):
+        """
+        Parameters:
+        years: array_like (N), the common year axis
+        values: array_like (S, N) or (N), NaN for the missing years
+        names: list of str, the column names, default "Series 1", ...
+        mask: bool array_like (S, N), optional, True for a valid observation, default all
+              finite values; the values outside the mask are set to NaN
+        keys: list, optional lookup keys of the series (e.g. column letters), default the names
+        year_name: str, name of the year column
+        """
+        years = np.asarray(years)
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        order = np.argsort(years, kind="stable")
+        if np.any(order[1:] < order[:-1]):
+            years, values = years[order], values[:, order]
+            mask = None if mask is None else np.atleast_2d(np.asarray(mask, dtype=bool))[:, order]
+        self.years = years.astype(int)
+        self.values = values
+        if mask is None:
+            self.mask = np.isfinite(values)
+        else:
+            self.mask = np.atleast_2d(np.asarray(mask, dtype=bool)) & np.isfinite(values)
+            if not self.mask.all():
+                self.values = np.where(self.mask, values, np.nan)
+        self.names = list(names) if names is not None else [f"Series {i + 1}" for i in range(len(values))]
+        self.keys = list(keys) if keys is not None else list(self.names)
+        self._positions = {key: i for i, key in enumerate(self.keys)}
+        self.year_name = year_name
+
+    @classmethod
+    def from_frame(cls, data, year_column=0, keys=None):
+        """
+        Build a panel from a DataFrame with one year column and any number of value columns,
+        the rows without a year are dropped, the value columns are converted in one block
+        Parameters:
+            data: DataFrame
+            year_column: int, position of the year column
+            keys: list, optional lookup keys of the value columns
+        """
+        value_columns = [i for i in range(data.shape[1]) if i != year_column]
+        years = data.iloc[:, year_column].to_numpy(dtype=float)
+        rows = np.isfinite(years)
+        block = data.iloc[:, value_columns].to_numpy(dtype=float)
+        return cls(years[rows], block[rows].T, [str(data.columns[i]) for i in value_columns], keys=keys,
+                   year_name=str(data.columns[year_column]))
+
+    @classmethod
+    def from_excel(cls, file_path, year_col, value_cols, sheet=0):
+        """
+        Read a year column and several value columns with one read_excel call
+        Parameters:
+            file_path: str
+            year_col: str, column letter of the years, e.g. "A"
+            value_cols: list of str, column letters of the series, e.g. ["B", "C", "I"]
+            sheet: str or int
+        Return:
+            SeriesPanel, the column letters are the keys of the series
+        """
+        import pandas as pd
+        value_cols = [col.strip().upper() for col in value_cols]
+        cols = [year_col.strip().upper()] + value_cols
+        with profile.stage("load"):
+            data = pd.read_excel(file_path, header=0, sheet_name=sheet, usecols=", ".join(cols))
+        # usecols returns the columns in sheet order, bring them back into the requested order
+        order = sorted(range(len(cols)), key=lambda i: column_index(cols[i]))
+        data = data.iloc[:, np.argsort(order)]
+        return cls.from_frame(data, 0, keys=value_cols)
+
+    def __len__(self):
+        return len(self.values)
+
+    def index(self, key):
+        """Position of a series by its key, its name or its position"""
+        if key in self._positions:
+            return self._positions[key]
+        if key in self.names:
+            return self.names.index(key)
+        if isinstance(key, (int, np.integer)) and -len(self) <= key < len(self):
+            return int(key) % len(self)
+        raise KeyError(f"Unknown series: {key}")
+
+    def name(self, key):
+        return self.names[self.index(key)]
+
+    def series(self, key):
+        """return : years, values of the valid observations of one series"""
+        return self.row(self.index(key))
+
+    def row(self, i):
+        """
+        years, values of the valid observations of the series at position i, the keys are not
+        looked up, so loops over the panel also work for integer keys (e.g. batch column indices)
+        """
+        return self.years[self.mask[i]], self.values[i, self.mask[i]]
+
+    def masked(self, key):
+        """return : numpy masked array of one series on the full year axis, without a copy"""
+        i = self.index(key)
+        return np.ma.MaskedArray(self.values[i], mask=~self.mask[i], copy=False)
+
+    @property
+    def counts(self):
+        """Number of valid observations per series"""
+        return self.mask.sum(axis=1)
+
+    def span(self):
+        """return : first and last valid year of every series, -1 for an empty series"""
+        any_valid = self.mask.any(axis=1)
+        first = np.where(any_valid, self.years[np.argmax(self.mask, axis=1)], -1)
+        last = np.where(any_valid, self.years[len(self.years) - 1 - np.argmax(self.mask[:, ::-1], axis=1)], -1)
+        return first, last
+
+    def select(self, keys):
+        """return : SeriesPanel with a subset of the series on the same year axis"""
+        rows = [self.index(key) for key in keys]
+        return SeriesPanel(self.years, self.values[rows], [self.names[i] for i in rows],
+                           self.mask[rows], [self.keys[i] for i in rows], self.year_name)
+
+    def decompose(self, period, model="additive"):
+        """
+        Seasonal decomposition (statsmodels seasonal_decompose) of every series between its
+        first and last valid year, gaps inside this span are interpolated for the decomposition
+        and stay invalid in the residual
+        Parameters:
+            period: int, in years
+            model: "additive" or "multiplicative"
+        Return:
+            dict "trend", "seasonal", "resid" -> SeriesPanel on the same year axis, the trend
+            is only valid where the moving average is defined
+        """
+        from statsmodels.tsa.seasonal import seasonal_decompose
+        parts = {part: np.full(self.values.shape, np.nan) for part in ("trend", "seasonal", "resid")}
+        first, last = self.span()
+        for i in range(len(self)):
+            if self.counts[i] < 2 * period:
+                continue
+            inside = (self.years >= first[i]) & (self.years <= last[i])
+            years, values = self.row(i)
+            span_values = np.interp(self.years[inside], years, values)
+            result = seasonal_decompose(span_values, model=model, period=period)
+            parts["trend"][i, inside] = result.trend
+            parts["seasonal"][i, inside] = result.seasonal
+            parts["resid"][i, inside] = np.where(self.mask[i, inside], result.resid, np.nan)
+        return {part: SeriesPanel(self.years, array, self.names, keys=self.keys, year_name=self.year_name)
+                for part, array in parts.items()}
+
+    def blend(self, future_years, predictions, cutoff_year, transition_width=1):
+        """
+        Forecast that follows the observations up to cutoff_year and turns linearly into the
+        model predictions over transition_width years
+        Parameters:
+            future_years: array_like (F)
+            predictions: array_like (S, F) or (F), predictions of every series on future_years
+            cutoff_year: int, last year taken from the data (interpolated in gaps)
+            transition_width: float, in years
+        Return:
+            array (S, F)
+        """
+        future_years = np.asarray(future_years, dtype=float)
+        predictions = np.broadcast_to(np.asarray(predictions, dtype=float), (len(self), len(future_years)))
+        weight = np.clip((future_years - cutoff_year) / transition_width, 0.0, 1.0) if transition_width > 0 \
+            else (future_years > cutoff_year).astype(float)
+        observed = np.empty(predictions.shape)
+        for i in range(len(self)):
+            years, values = self.row(i)
+            observed[i] = np.interp(future_years, years, values) if len(years) else np.nan
+        # Only the observed part needs the data, NaN predictions there must not leak in
+        return np.where(weight == 0, observed, (1 - weight) * observed + weight * predictions)